@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def fingerprint(*parts):
+    return hashlib.sha256('\0'.join(str(part) for part in parts).encode()).hexdigest()[:16]
+
+
+class FileHasher:
+    # SHA-256 of file contents, remembered per (path, size, mtime) so unchanged files are hashed
+    # once. Only the max_entries most recently used files are remembered.
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.known = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __call__(self, path):
+        stat = os.stat(path)
+        identity = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            if identity in self.known:
+                self.known.move_to_end(identity)
+                return self.known[identity]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        with self.lock:
+            self.known[identity] = digest.hexdigest()
+            while len(self.known) > self.max_entries:
+                self.known.popitem(last=False)
+        return digest.hexdigest()
+
+
+class AnalysisCache:
+    # Two tiers: an in-process LRU in front of a directory of JSON entries that every Flask
+    # worker on the host shares. Every entry carries its own expiry time. Expired files are
+    # swept from the directory at startup and then in the background every prune_every writes.
+    def __init__(self, directory, max_memory_entries=256, prune_every=200):
+        self.directory = directory
+        self.max_memory_entries = max_memory_entries
+        self.prune_every = prune_every
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = {'memory': 0, 'disk': 0, 'miss': 0}
+        self.writes = 0
+        self.pruning = False
+        os.makedirs(directory, exist_ok=True)
+        self._prune_in_background()
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest() + '.json')
+
+    def _remember(self, key, entry):
+        with self.lock:
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_memory_entries:
+                self.memory.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if entry['expires_at'] > now:
+                    self.memory.move_to_end(key)
+                    self.hits['memory'] += 1
+                    return entry['value']
+                del self.memory[key]
+
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        if entry is None or entry['expires_at'] <= now:
+            if entry is not None:
+                self.delete(key)
+            with self.lock:
+                self.hits['miss'] += 1
+            return None
+
+        self._remember(key, entry)
+        with self.lock:
+            self.hits['disk'] += 1
+        return entry['value']
+
+    def set(self, key, value, ttl):
+        entry = {'key': key, 'expires_at': time.time() + ttl, 'value': value}
+        self._remember(key, entry)
+        # Write then rename so other workers never read a half-written entry
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            self.writes += 1
+            due = self.prune_every and self.writes % self.prune_every == 0
+        if due:
+            self._prune_in_background()
+
+    def delete(self, key):
+        with self.lock:
+            self.memory.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _prune_in_background(self):
+        with self.lock:
+            if self.pruning:
+                return
+            self.pruning = True
+
+        def run():
+            try:
+                self.prune()
+            finally:
+                with self.lock:
+                    self.pruning = False
+
+        threading.Thread(target=run, name='cache-prune', daemon=True).start()
+
+    def prune(self):
+        # Drop expired entries from disk; returns how many were removed
+        now = time.time()
+        removed = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path) as f:
+                    expired = json.load(f)['expires_at'] <= now
+            except (OSError, ValueError, KeyError):
+                expired = True
+            if expired:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
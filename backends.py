@@ -0,0 +1,151 @@
+import os
+import random
+from abc import ABC, abstractmethod
+import threading
+import time
+import uuid
+
+
+class BackendError(Exception):
+    pass
+
+
+class AnalysisBackend(ABC):
+    # What the analysis service needs from a model provider: upload a video, wait for it to be
+    # processed, generate text. generate() streams through on_text when it is given.
+    name = None
+    model_name = None
+    poll_interval = 5.0
+
+    @abstractmethod
+    def upload(self, path):
+        pass
+
+    @abstractmethod
+    def get_file(self, name):
+        pass
+
+    @abstractmethod
+    def is_processing(self, handle):
+        pass
+
+    def expires_at(self, handle):
+        return None
+
+    @abstractmethod
+    def generate(self, parts, on_text=None):
+        pass
+
+
+class GeminiBackend(AnalysisBackend):
+    name = 'gemini'
+
+    def __init__(self, api_key, model_name='gemini-1.5-pro', timeout=600):
+        import google.generativeai as genai
+
+        self.genai = genai
+        self.genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.timeout = timeout
+
+    def upload(self, path):
+        return self.genai.upload_file(path=path)
+
+    def get_file(self, name):
+        return self.genai.get_file(name)
+
+    def is_processing(self, handle):
+        if handle.state.name == 'FAILED':
+            raise BackendError(f'Gemini could not process {handle.name}')
+        return handle.state.name == 'PROCESSING'
+
+    def expires_at(self, handle):
+        expiration = getattr(handle, 'expiration_time', None)
+        return expiration.timestamp() if expiration is not None else None
+
+    def generate(self, parts, on_text=None):
+        request_options = {'timeout': self.timeout}
+        if on_text is None:
+            return self.model.generate_content(parts, request_options=request_options).text
+        chunks = []
+        for chunk in self.model.generate_content(parts, stream=True, request_options=request_options):
+            chunks.append(chunk.text)
+            on_text(chunk.text)
+        return ''.join(chunks)
+
+
+class FakeFile:
+    def __init__(self, name, size, ready_at):
+        self.name = name
+        self.uri = f'fake://{name}'
+        self.size = size
+        self.ready_at = ready_at
+
+
+class FakeBackend(AnalysisBackend):
+    # Local stand-in for load testing: no network, with configurable latencies (seconds),
+    # failure rate and streaming. Upload time scales with file size like a real upload.
+    name = 'fake'
+    model_name = 'fake-model'
+
+    def __init__(self, upload_seconds_per_mb=0.05, processing_seconds=2.0, first_chunk_seconds=1.0,
+                 chunk_interval=0.05, chunks=40, failure_rate=0.0, poll_interval=0.5, seed=None):
+        self.upload_seconds_per_mb = upload_seconds_per_mb
+        self.processing_seconds = processing_seconds
+        self.first_chunk_seconds = first_chunk_seconds
+        self.chunk_interval = chunk_interval
+        self.chunks = chunks
+        self.failure_rate = failure_rate
+        self.poll_interval = poll_interval
+        self.random = random.Random(seed)
+        self.files = {}
+        self.lock = threading.Lock()
+
+    def _maybe_fail(self, what):
+        with self.lock:
+            failed = self.random.random() < self.failure_rate
+        if failed:
+            raise BackendError(f'fake {what} failure')
+
+    def upload(self, path):
+        size = os.path.getsize(path)
+        time.sleep(self.upload_seconds_per_mb * size / 1e6)
+        self._maybe_fail('upload')
+        handle = FakeFile(f'files/{uuid.uuid4().hex}', size, time.time() + self.processing_seconds)
+        with self.lock:
+            self.files[handle.name] = handle
+        return handle
+
+    def get_file(self, name):
+        with self.lock:
+            if name not in self.files:
+                raise BackendError(f'{name} not found')
+            return self.files[name]
+
+    def is_processing(self, handle):
+        return time.time() < handle.ready_at
+
+    def expires_at(self, handle):
+        return handle.ready_at + 48 * 3600
+
+    def generate(self, parts, on_text=None):
+        time.sleep(self.first_chunk_seconds)
+        self._maybe_fail('generation')
+        chunks = []
+        for i in range(self.chunks):
+            if i:
+                time.sleep(self.chunk_interval)
+            chunk = f'Fake analysis chunk {i + 1} of {self.chunks}. '
+            chunks.append(chunk)
+            if on_text is not None:
+                on_text(chunk)
+        return ''.join(chunks)
+
+
+def make_backend(name, **kwargs):
+    if name == 'gemini':
+        return GeminiBackend(**kwargs)
+    if name == 'fake':
+        return FakeBackend(**kwargs)
+    raise ValueError(f'unknown analysis backend {name!r}')
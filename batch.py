@@ -0,0 +1,119 @@
+import argparse
+import hashlib
+import json
+import os
+import pathlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from main import ProstheticJointDetector
+
+# One detector (and so one MediaPipe Pose graph) per worker process
+detector = None
+
+
+def init_worker():
+    global detector
+    detector = ProstheticJointDetector()
+
+
+def frame_count(path):
+    cap = cv2.VideoCapture(str(path))
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return count
+
+
+def split_ranges(total_frames, chunk_frames):
+    # Unknown length (some containers report 0) means one range read until the end
+    if total_frames <= 0:
+        return [(0, None)]
+    return [(start, min(start + chunk_frames, total_frames))
+            for start in range(0, total_frames, chunk_frames)]
+
+
+def analyze_frame(detector, frame):
+    result = detector.detect(frame)
+    if not result.pose_found:
+        return None, [], []
+
+    return (
+        result.landmarks.tolist(),
+        [int(area) for area in result.overlap_areas],
+        [bool(flag) for flag in result.detected],
+    )
+
+
+def analyze_range(path, start, end):
+    # Tracking state from the previous range belongs to another part of the video
+    detector.pose.reset()
+
+    cap = cv2.VideoCapture(str(path))
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    records = []
+    index = start
+    while end is None or index < end:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        landmarks, overlap_areas, prosthetic = analyze_frame(detector, frame)
+        records.append({
+            'frame': index,
+            'landmarks': landmarks,
+            'overlap_areas': overlap_areas,
+            'prosthetic': prosthetic,
+        })
+        index += 1
+    cap.release()
+    return records
+
+
+def output_name(video):
+    # Same-named recordings from different folders (or t.mp4 next to t.webm) must not share
+    # an output file, so the name carries a hash of the absolute path
+    path = pathlib.Path(video).resolve()
+    digest = hashlib.sha1(str(path).encode()).hexdigest()[:8]
+    return f'{path.name}-{digest}.jsonl'
+
+
+def run_batch(videos, output_dir, workers=None, chunk_frames=900):
+    output_dir = pathlib.Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        # Queue every range of every video up front so the pool never idles between files
+        jobs = {}
+        for video in videos:
+            out_path = output_dir / output_name(video)
+            if out_path in jobs:
+                continue  # the same file given twice
+            ranges = split_ranges(frame_count(video), chunk_frames)
+            jobs[out_path] = (video, [pool.submit(analyze_range, video, start, end) for start, end in ranges])
+
+        for out_path, (video, futures) in jobs.items():
+            started = time.perf_counter()
+            frames = 0
+            with open(out_path, 'w') as out:
+                # Futures are in range order, so results merge back in frame order
+                for future in futures:
+                    for record in future.result():
+                        out.write(json.dumps(record) + '\n')
+                        frames += 1
+            print(f'{video}: {frames} frames -> {out_path} ({time.perf_counter() - started:.1f}s wait)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run prosthetic segment detection over recorded videos")
+    parser.add_argument("videos", nargs="+", help="video files to analyse")
+    parser.add_argument("--output-dir", default="batch_results", help="where to write one <name>-<hash>.jsonl per video")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--chunk-frames", type=int, default=900, help="frames per work unit")
+    args = parser.parse_args()
+
+    run_batch(args.videos, args.output_dir, args.workers, args.chunk_frames)
+
+
+if __name__ == "__main__":
+    main()
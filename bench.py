@@ -0,0 +1,203 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from main import ProstheticJointDetector
+from smoothing import Landmark, landmarks_to_array
+
+RESOLUTIONS = {'480p': (640, 480), '720p': (1280, 720), '1080p': (1920, 1080)}
+
+# Normalized standing pose used when the frame has no detectable person, so the
+# mask/scoring/drawing stages are always measured on a realistic limb layout
+STANDING_POSE = {
+    11: (0.44, 0.30), 12: (0.56, 0.30),  # shoulders
+    13: (0.40, 0.42), 14: (0.60, 0.42),  # elbows
+    15: (0.38, 0.54), 16: (0.62, 0.54),  # wrists
+    23: (0.46, 0.55), 24: (0.54, 0.55),  # hips
+    25: (0.45, 0.72), 26: (0.55, 0.72),  # knees
+    27: (0.45, 0.90), 28: (0.55, 0.90),  # ankles
+}
+
+
+def standing_landmarks():
+    return [Landmark(*STANDING_POSE.get(i, (0.5, 0.2)), 0.0, 1.0) for i in range(33)]
+
+
+def synthetic_frame(width, height, seed=0):
+    # Textured background with one leg covered in dark material
+    rng = np.random.default_rng(seed)
+    frame = cv2.resize((rng.random((height // 8, width // 8, 3)) * 200 + 40).astype(np.uint8), (width, height))
+    pixels = {i: (int(x * width), int(y * height)) for i, (x, y) in STANDING_POSE.items()}
+    for start, end in ((11, 13), (13, 15), (12, 14), (14, 16), (23, 25), (24, 26), (26, 28)):
+        cv2.line(frame, pixels[start], pixels[end], (150, 120, 100), max(4, width // 60))
+    cv2.line(frame, pixels[25], pixels[27], (10, 10, 10), max(6, width // 40))
+    return frame
+
+
+def video_frames(path, limit):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def time_stage(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(1000 * (time.perf_counter() - started))
+    return samples
+
+
+def bench_frames(detector, frames, iterations):
+    # Mirrors process_frame one stage at a time
+    frame = frames[0]
+    results = detector.pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    landmarks = results.pose_landmarks.landmark if results.pose_landmarks else standing_landmarks()
+    mask = detector.detect_prosthetic_color(frame, landmarks)
+    segment_pixels = detector.segment_pixels(landmarks, frame.shape)
+    detected = detector.segment_overlap_areas(mask, segment_pixels) > detector.min_area_threshold
+    endpoints = [(landmarks[start], landmarks[end]) for _, start, end in detector.segments]
+    canned = landmarks_to_array(landmarks, np.empty((33, 4), dtype=np.float32))
+    estimate_landmarks = detector.estimate_landmarks
+
+    def with_pose(fn):
+        # End-to-end stages still pay for pose inference, but fall back to the canned pose when
+        # it finds nobody, so mask, scoring and drawing are part of the measurement
+        def estimate_or_standing(frame):
+            found = estimate_landmarks(frame)
+            return found if found is not None else canned
+
+        def run():
+            detector.estimate_landmarks = estimate_or_standing
+            try:
+                return fn()
+            finally:
+                del detector.estimate_landmarks
+        return run
+
+    def pose():
+        # Different frames each call, so the tracker does real work
+        pose.index = (pose.index + 1) % len(frames)
+        detector.pose.process(cv2.cvtColor(frames[pose.index], cv2.COLOR_BGR2RGB))
+    pose.index = 0
+
+    def landmark_geometry():
+        # Landmark conversion into the reused buffer plus all pixel coordinates
+        array = landmarks_to_array(landmarks, detector.landmark_buffer)
+        detector.segment_pixels(array, frame.shape, detector.pixel_coordinates(array, frame.shape))
+
+    def region_checks():
+        for start_point, end_point in endpoints:
+            detector.check_prosthetic_in_region(frame, mask, start_point, end_point)
+
+    stages = {
+        'bgr_to_rgb': lambda: cv2.cvtColor(frame, cv2.COLOR_BGR2RGB),
+        'pose_process': pose,
+        'landmark_geometry': landmark_geometry,
+        'color_mask_full': lambda: detector.color_mask(frame),
+        'color_mask': lambda: detector.detect_prosthetic_color(frame, landmarks),
+        'region_checks_x8': region_checks,
+        'segment_scoring': lambda: detector.segment_overlap_areas(
+            mask, detector.segment_pixels(landmarks, frame.shape)),
+        'drawing': lambda: detector.draw_detections(frame.copy(), segment_pixels, detected),
+        'detect': with_pose(lambda: detector.detect(frame)),
+        'process_frame': with_pose(lambda: detector.process_frame(frame.copy())),
+    }
+    report = {}
+    for name, fn in stages.items():
+        fn()  # warm-up
+        samples = time_stage(fn, iterations)
+        report[name] = {
+            'median_ms': round(statistics.median(samples), 4),
+            'p95_ms': round(sorted(samples)[int(0.95 * (len(samples) - 1))], 4),
+        }
+    return report
+
+
+def run(iterations, videos, resolutions):
+    detector = ProstheticJointDetector()
+    suites = {}
+    for name in resolutions:
+        width, height = RESOLUTIONS[name]
+        frames = [synthetic_frame(width, height, seed) for seed in range(4)]
+        suites[f'synthetic_{name}'] = bench_frames(detector, frames, iterations)
+    for path in videos:
+        frames = video_frames(path, 60)
+        if frames:
+            h, w = frames[0].shape[:2]
+            suites[f'video_{path}_{w}x{h}'] = bench_frames(detector, frames, iterations)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'machine': platform.machine(),
+            'iterations': iterations,
+        },
+        'suites': suites,
+    }
+
+
+def print_report(result):
+    for suite, stages in result['suites'].items():
+        print(suite)
+        for stage, timing in stages.items():
+            print(f"  {stage:<18} median {timing['median_ms']:9.3f} ms   p95 {timing['p95_ms']:9.3f} ms")
+
+
+def compare(result, baseline, tolerance, min_delta_ms=0.05):
+    # Returns the stages whose median regressed by more than tolerance (and by min_delta_ms)
+    regressions = []
+    for suite, stages in result['suites'].items():
+        for stage, timing in stages.items():
+            before = baseline['suites'].get(suite, {}).get(stage)
+            if before is None:
+                continue
+            now, was = timing['median_ms'], before['median_ms']
+            if now > was * (1 + tolerance) and now - was > min_delta_ms:
+                regressions.append(f'{suite}/{stage}: {was:.3f} -> {now:.3f} ms')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of ProstheticJointDetector")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--resolution", action="append", choices=sorted(RESOLUTIONS),
+                        help="synthetic frame sizes to run (default: all)")
+    parser.add_argument("--video", action="append", default=[], help="recorded video to benchmark on")
+    parser.add_argument("--save", metavar="JSON", help="write results as a baseline")
+    parser.add_argument("--compare", metavar="JSON", help="fail if slower than this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    result = run(args.iterations, args.video, args.resolution or list(RESOLUTIONS))
+    print_report(result)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print(f'no regressions beyond {args.tolerance:.0%} of {args.compare}')
+
+
+if __name__ == "__main__":
+    main()
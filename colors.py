@@ -0,0 +1,39 @@
+import threading
+
+import cv2
+import numpy as np
+
+_tables = {}
+_lock = threading.Lock()
+
+
+def ranges_key(color_ranges):
+    return tuple((tuple(int(v) for v in r['lower']), tuple(int(v) for v in r['upper'])) for r in color_ranges)
+
+
+def compile_color_ranges(color_ranges):
+    # One byte for every 24-bit BGR colour, 255 where its HSV falls in any of the ranges. Built
+    # with the same cvtColor/inRange calls as the per-frame path, so results are identical.
+    # Tables are cached per set of ranges and shared by every detector in the process.
+    key = ranges_key(color_ranges)
+    with _lock:
+        table = _tables.get(key)
+        if table is None:
+            colors = np.arange(1 << 24, dtype=np.uint32).reshape(4096, 4096)
+            bgr = np.empty((4096, 4096, 3), dtype=np.uint8)
+            for channel in range(3):
+                bgr[..., channel] = (colors >> (8 * channel)) & 0xFF
+            hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+            table = np.zeros((4096, 4096), dtype=np.uint8)
+            for lower, upper in key:
+                cv2.bitwise_or(table, cv2.inRange(hsv, lower, upper), dst=table)
+            table = _tables[key] = table.ravel()
+    return table
+
+
+def classify_colors(frame, table):
+    # Per-pixel table lookup: cost does not depend on how many ranges went into the table
+    bgra = cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)
+    index = bgra.view(np.uint32)[..., 0]
+    np.bitwise_and(index, 0xFFFFFF, out=index)
+    return np.take(table, index)
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import threading
+
+import cv2
+
+from analysis_cache import fingerprint
+from summary import frame_time
+
+# One lock per output file, so concurrent jobs for the same video encode it once
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _open_writer(path, fps, size):
+    # H.264 when this OpenCV build has it, MPEG-4 part 2 otherwise
+    for codec in ('avc1', 'mp4v'):
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, size)
+        if writer.isOpened():
+            return writer
+        writer.release()
+    raise RuntimeError(f'no usable video encoder for {path}')
+
+
+def compaction_key(max_side, max_fps, motion_threshold, max_static_gap):
+    return fingerprint('compact', 3, max_side, max_fps, motion_threshold, max_static_gap)
+
+
+def compact_video(path, cache_dir, max_side=640, max_fps=10.0, motion_threshold=1.0,
+                  max_static_gap=1.0, video_hash=None):
+    # Re-encode a recording for upload: cap the frame rate, downscale so the longest side is
+    # max_side, and replace frames that barely differ from the last kept one with a repeat of it
+    # (keeping a fresh frame at least every max_static_gap seconds). Repeats encode to almost
+    # nothing but keep every output frame at its original time, so pauses stay as long as they
+    # were. Output is cached by input content hash and settings.
+    video_hash = video_hash or _sha256(path)
+    key = compaction_key(max_side, max_fps, motion_threshold, max_static_gap)
+    os.makedirs(cache_dir, exist_ok=True)
+    out_path = os.path.join(cache_dir, f'{video_hash}-{key}.mp4')
+    with _locks_lock:
+        lock = _locks.setdefault(out_path, threading.Lock())
+    try:
+        with lock:
+            if os.path.exists(out_path):
+                return out_path
+            return _compact(path, out_path, max_side, max_fps, motion_threshold, max_static_gap)
+    finally:
+        # Later callers find the file; a waiter still holding this lock sees it too
+        with _locks_lock:
+            if _locks.get(out_path) is lock:
+                del _locks[out_path]
+
+
+def _compact(path, out_path, max_side, max_fps, motion_threshold, max_static_gap):
+    # Output runs at a constant max_fps. Browser recordings have no reliable frame rate, so
+    # decoded frames are placed by their timestamps and each output slot shows the newest
+    # frame at or before its time.
+    cap = cv2.VideoCapture(str(path))
+    fallback_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    step = 1.0 / max_fps
+    tmp_path = f'{out_path}.{os.getpid()}.{threading.get_ident()}.tmp.mp4'
+    writer = None
+    last_thumbnail = None
+    last_written = None
+    last_kept_at = None
+    next_slot = 0.0
+    kept = 0
+
+    def write_slot(frame, slot_t):
+        nonlocal writer, last_thumbnail, last_written, last_kept_at, kept
+        thumbnail = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (64, 48),
+                               interpolation=cv2.INTER_AREA)
+        if last_thumbnail is not None and slot_t - last_kept_at < max_static_gap:
+            if cv2.absdiff(thumbnail, last_thumbnail).mean() < motion_threshold:
+                writer.write(last_written)
+                return
+
+        h, w = frame.shape[:2]
+        scale = min(1.0, max_side / max(h, w))
+        # Most encoders want even dimensions
+        size = (max(2, int(w * scale) // 2 * 2), max(2, int(h * scale) // 2 * 2))
+        if writer is None:
+            writer = _open_writer(tmp_path, max_fps, size)
+        if size != (w, h):
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        writer.write(frame)
+        last_written = frame
+        last_thumbnail = thumbnail
+        last_kept_at = slot_t
+        kept += 1
+
+    try:
+        previous = None
+        index = 0
+        t = 0.0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            t = frame_time(cap, index, fallback_fps)
+            index += 1
+            if previous is not None:
+                while next_slot < t:
+                    write_slot(previous, next_slot)
+                    next_slot += step
+            previous = frame
+        if previous is not None and next_slot <= t:
+            write_slot(previous, next_slot)
+    except BaseException:
+        if writer is not None:
+            writer.release()
+            writer = None
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.release()
+
+    if kept == 0:
+        # Nothing decodable; let the caller upload the original
+        return str(path)
+    os.replace(tmp_path, out_path)
+    return out_path
@@ -0,0 +1,226 @@
+import io
+import threading
+import time
+import traceback
+
+import cv2
+
+from main import ProstheticJointDetector
+from summary import frame_time, sampling_rates, summarize
+
+# OpenCV holds one process-wide lock while it opens any capture, and opening a ChunkStream
+# blocks on our reads. The session waits for this much data before opening, and reads during
+# the open give up after OPEN_TIMEOUT, so a recording with no data cannot stall other captures.
+OPEN_BYTES = 128 * 1024
+OPEN_TIMEOUT = 5.0
+
+
+class ChunkStream(io.BufferedIOBase):
+    # Read-only view of a recording file that grows as chunks arrive. Reads past what has
+    # arrived block until more is fed or the stream is ended, so the decoder simply waits for
+    # the patient. An upload that stalls for idle_timeout seconds is treated as finished. The
+    # bytes stay on disk: feed() only announces the new size, and each read opens the file
+    # briefly, so finishing the recording can rename it under us.
+    def __init__(self, path, idle_timeout=300):
+        super().__init__()
+        self.path = path
+        self.size = 0
+        self.position = 0
+        self.ended = False
+        self.idle_timeout = idle_timeout
+        self.timeout = idle_timeout
+        self.changed = threading.Condition()
+
+    def feed(self, size):
+        with self.changed:
+            if self.ended:
+                return
+            self.size = max(self.size, size)
+            self.changed.notify_all()
+
+    def end(self, path=None):
+        with self.changed:
+            if path is not None:
+                self.path = path
+            self.ended = True
+            self.changed.notify_all()
+
+    def wait_for(self, size):
+        # Blocks until size bytes have arrived or the stream has ended
+        with self.changed:
+            while self.size < size and not self.ended:
+                if not self.changed.wait(self.timeout):
+                    self.ended = True
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        with self.changed:
+            while self.position >= self.size and not self.ended:
+                if not self.changed.wait(self.timeout):
+                    self.ended = True
+            stop = self.size if size is None or size < 0 else min(self.size, self.position + size)
+            if stop <= self.position:
+                return b''
+            while True:
+                path = self.path
+                try:
+                    with open(path, 'rb') as f:
+                        f.seek(self.position)
+                        chunk = f.read(stop - self.position)
+                    break
+                except FileNotFoundError:
+                    # Renamed to its finished name; end() hands over the new path
+                    if not self.changed.wait_for(lambda: self.path != path, self.timeout):
+                        return b''
+            self.position += len(chunk)
+            return chunk
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # SEEK_END is relative to what has arrived so far
+        with self.changed:
+            base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+            self.position = max(0, base + offset)
+            return self.position
+
+    def tell(self):
+        return self.position
+
+
+class SessionBuffer:
+    # Recorder for the detector that keeps records in the same shape as summary.extract_records
+    def __init__(self):
+        self.records = []
+        self.frame = 0
+
+    def write(self, landmarks, flags):
+        if landmarks is not None:
+            landmarks = landmarks.tolist()
+        self.records.append({'frame': self.frame, 'landmarks': landmarks,
+                             'prosthetic': [bool(flag) for flag in flags]})
+
+
+class IngestSession:
+    # Decodes one recording while it is being uploaded and runs every Nth frame through the
+    # detector, so the pose summary is ready soon after the last chunk arrives
+    def __init__(self, recording_id, path, target_fps=10.0, detector_factory=ProstheticJointDetector):
+        self.recording_id = recording_id
+        self.target_fps = target_fps
+        self.detector_factory = detector_factory
+        self.stream = ChunkStream(path)
+        self.buffer = SessionBuffer()
+        self.frames = 0
+        self.summary = None
+        self.error = None
+        self.cancelled = False
+        self.finished_at = None
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f'ingest-{recording_id[:8]}', daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled = True
+        self.stream.end()
+
+    def _run(self):
+        try:
+            detector = self.detector_factory()
+            detector.recorder = self.buffer
+            self.stream.wait_for(OPEN_BYTES)
+            self.stream.timeout = OPEN_TIMEOUT
+            cap = cv2.VideoCapture(self.stream, cv2.CAP_FFMPEG, [])
+            self.stream.timeout = self.stream.idle_timeout
+            fallback_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            width = height = 0
+            next_sample = 0.0
+            last_t = 0.0
+            while not self.cancelled:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                t = frame_time(cap, self.frames, fallback_fps)
+                last_t = max(last_t, t)
+                if t >= next_sample:
+                    while next_sample <= t:
+                        next_sample += 1.0 / self.target_fps
+                    height, width = frame.shape[:2]
+                    self.buffer.frame = self.frames
+                    detector.detect(frame)
+                self.frames += 1
+            cap.release()
+
+            if not self.cancelled and self.buffer.records:
+                fps, source_fps = sampling_rates(self.frames, last_t, len(self.buffer.records), fallback_fps)
+                self.summary = summarize(self.buffer.records, {
+                    'fps': fps,
+                    'source_fps': source_fps,
+                    'width': width,
+                    'height': height,
+                    'frames': self.frames,
+                    'segments': detector.segment_names,
+                })
+        except Exception as e:
+            traceback.print_exc()
+            self.error = str(e)
+        finally:
+            self.finished_at = time.time()
+            self.done.set()
+
+
+class IngestManager:
+    # Listener for RecordingStore: starts an IngestSession per recording and feeds it each new
+    # chunk. Beyond max_active concurrent recordings the summary is left to the analysis job.
+    def __init__(self, max_active=4, keep_finished=3600, target_fps=10.0):
+        self.max_active = max_active
+        self.keep_finished = keep_finished
+        self.target_fps = target_fps
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def started(self, recording_id, path):
+        with self.lock:
+            self._prune()
+            previous = self.sessions.pop(recording_id, None)
+            if previous is not None:
+                previous.cancel()
+            active = sum(1 for session in self.sessions.values() if not session.done.is_set())
+            if active < self.max_active:
+                self.sessions[recording_id] = IngestSession(recording_id, path, self.target_fps)
+
+    def appended(self, recording_id, received):
+        session = self.get(recording_id)
+        if session is not None:
+            session.stream.feed(received)
+
+    def finished(self, recording_id, path):
+        session = self.get(recording_id)
+        if session is not None:
+            session.stream.end(path)
+
+    def get(self, recording_id):
+        with self.lock:
+            return self.sessions.get(recording_id)
+
+    def status(self, recording_id):
+        session = self.get(recording_id)
+        if session is None:
+            return None
+        return {'frames_decoded': session.frames, 'frames_analysed': len(session.buffer.records),
+                'done': session.done.is_set(), 'error': session.error}
+
+    def result(self, recording_id, timeout=None):
+        # The summary of a finished recording, or None if it was not (or could not be) ingested
+        session = self.get(recording_id)
+        if session is None or not session.done.wait(timeout):
+            return None
+        return session.summary
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_finished
+        for recording_id in [recording_id for recording_id, session in self.sessions.items()
+                             if session.finished_at is not None and session.finished_at < cutoff]:
+            del self.sessions[recording_id]
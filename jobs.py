@@ -0,0 +1,106 @@
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = 'queued'
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+        # (kind, data) log that event-stream subscribers replay and then follow
+        self.events = []
+        self.changed = threading.Condition()
+
+    def publish(self, kind, data):
+        with self.changed:
+            self.events.append((kind, data))
+            self.changed.notify_all()
+
+    def events_since(self, index, timeout=None):
+        with self.changed:
+            if index >= len(self.events):
+                self.changed.wait(timeout)
+            return self.events[index:]
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobQueue:
+    # Runs analysis jobs on a bounded thread pool so request handlers return immediately.
+    # Jobs run fn(*args, progress=..., on_text=...): progress records the current stage,
+    # on_text publishes generated text as it arrives.
+    def __init__(self, workers=4, max_pending=64, keep_finished=3600):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis')
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def pending(self):
+        return sum(1 for job in self.jobs.values() if not job.done.is_set())
+
+    def submit(self, fn, *args):
+        with self.lock:
+            self._prune()
+            if self.pending() >= self.max_pending:
+                raise QueueFull(f'{self.max_pending} analyses already queued')
+            job = Job(uuid.uuid4().hex)
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job, fn, args):
+        job.status = 'running'
+        job.started_at = time.time()
+
+        def progress(stage):
+            job.stage = stage
+            job.publish('stage', stage)
+
+        def on_text(text):
+            job.publish('text', text)
+
+        try:
+            job.result = fn(*args, progress=progress, on_text=on_text)
+            job.status = 'done'
+            job.publish('done', None)
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = 'error'
+            job.publish('error', job.error)
+        finally:
+            job.finished_at = time.time()
+            job.done.set()
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_finished
+        for job_id in [job.id for job in self.jobs.values()
+                       if job.finished_at is not None and job.finished_at < cutoff]:
+            del self.jobs[job_id]
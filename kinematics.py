@@ -0,0 +1,92 @@
+import numpy as np
+
+NUM_LANDMARKS = 33
+
+# MediaPipe Pose landmark indices
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+LEFT_FOOT_INDEX, RIGHT_FOOT_INDEX = 31, 32
+
+# Each joint angle is measured at the middle landmark, between the other two
+JOINT_ANGLES = {
+    'left_hip': (LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE),
+    'right_hip': (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_KNEE),
+    'left_knee': (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE),
+    'right_knee': (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE),
+    'left_ankle': (LEFT_KNEE, LEFT_ANKLE, LEFT_FOOT_INDEX),
+    'right_ankle': (RIGHT_KNEE, RIGHT_ANKLE, RIGHT_FOOT_INDEX),
+    'left_elbow': (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+    'right_elbow': (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+    'left_shoulder': (LEFT_ELBOW, LEFT_SHOULDER, LEFT_HIP),
+    'right_shoulder': (RIGHT_ELBOW, RIGHT_SHOULDER, RIGHT_HIP),
+}
+JOINT_NAMES = list(JOINT_ANGLES)
+JOINT_INDICES = np.array(list(JOINT_ANGLES.values()))
+
+
+def landmarks_from_records(records):
+    # Stack per-frame landmark lists (as written by batch.py) into (frames, 33, 4), NaN where no pose
+    landmarks = np.full((len(records), NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+    for i, record in enumerate(records):
+        if record['landmarks'] is not None:
+            landmarks[i] = record['landmarks']
+    return landmarks
+
+
+def joint_angles(landmarks, aspect=1.0, use_z=False, min_visibility=0.5):
+    # landmarks: (frames, 33, 4) of x, y, z, visibility in MediaPipe's normalized coordinates.
+    # aspect is frame width / height, needed because x and y are normalized separately.
+    # Returns (frames, joints) angles in degrees, NaN where a landmark is missing or not visible.
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    dims = 3 if use_z else 2
+    points = landmarks[:, JOINT_INDICES, :dims].copy()
+    points[..., 0] *= aspect
+    if use_z:
+        # MediaPipe's z uses roughly the same scale as x
+        points[..., 2] *= aspect
+
+    first = points[:, :, 0] - points[:, :, 1]
+    second = points[:, :, 2] - points[:, :, 1]
+    dot = np.einsum('fjd,fjd->fj', first, second)
+    norms = np.linalg.norm(first, axis=-1) * np.linalg.norm(second, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        angles = np.degrees(np.arccos(np.clip(dot / norms, -1.0, 1.0)))
+
+    visibility = landmarks[:, JOINT_INDICES, 3]
+    hidden = ~(visibility >= min_visibility).all(axis=-1)
+    angles[hidden | (norms == 0)] = np.nan
+    return angles
+
+
+def angular_velocity(angles, fps):
+    # Central differences in degrees per second; NaN gaps stay NaN
+    if len(angles) < 2:
+        return np.full_like(angles, np.nan)
+    return np.gradient(angles, 1.0 / fps, axis=0)
+
+
+def range_of_motion(angles):
+    valid = ~np.isnan(angles).all(axis=0)
+    minimum = np.full(angles.shape[1], np.nan)
+    maximum = np.full(angles.shape[1], np.nan)
+    if valid.any():
+        minimum[valid] = np.nanmin(angles[:, valid], axis=0)
+        maximum[valid] = np.nanmax(angles[:, valid], axis=0)
+    return {
+        name: {'min': lo, 'max': hi, 'range': hi - lo}
+        for name, lo, hi in zip(JOINT_NAMES, minimum.tolist(), maximum.tolist())
+    }
+
+
+def analyze_session(landmarks, fps=30.0, aspect=1.0, use_z=False, min_visibility=0.5):
+    angles = joint_angles(landmarks, aspect=aspect, use_z=use_z, min_visibility=min_visibility)
+    return {
+        'joints': JOINT_NAMES,
+        'angles': angles,
+        'angular_velocity': angular_velocity(angles, fps),
+        'range_of_motion': range_of_motion(angles),
+    }
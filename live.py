@@ -0,0 +1,93 @@
+import json
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+from simple_websocket import ConnectionClosed
+
+from main import ProstheticJointDetector
+from pipeline import LatestFrameQueue
+
+# Frames from the browser are expected to be downscaled already; anything larger is shrunk
+MAX_SIDE = 480
+
+
+def analyze_live_frame(detector, frame):
+    # Landmarks as a flat [x, y, visibility, ...] list and segment detections as a bitmask
+    result = detector.detect(frame)
+    if not result.pose_found:
+        return None, 0
+    flags = int(np.sum(result.detected.astype(np.int64) << np.arange(len(result.detected))))
+    points = result.landmarks[:, [0, 1, 3]].astype(np.float64)
+    points[:, :2] = points[:, :2].round(4)
+    points[:, 2] = points[:, 2].round(2)
+    return points.reshape(-1).tolist(), flags
+
+
+def decode_frame(data, max_side=MAX_SIDE):
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        return None
+    h, w = frame.shape[:2]
+    scale = max_side / max(h, w)
+    if scale < 1:
+        frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    return frame
+
+
+def serve_live(ws, detector=None):
+    # One WebSocket client: binary JPEG frames in, one compact JSON message per processed frame
+    # out. A reader thread keeps only the newest frame, so a client sending faster than we can
+    # process loses frames instead of building up a queue.
+    detector = detector or ProstheticJointDetector()
+    frames = LatestFrameQueue()
+
+    def receive():
+        received = 0
+        try:
+            while True:
+                data = ws.receive()
+                if isinstance(data, (bytes, bytearray)):
+                    received += 1
+                    frames.put((received, data))
+        except ConnectionClosed:
+            pass
+        finally:
+            frames.close()
+
+    threading.Thread(target=receive, name='live-receive', daemon=True).start()
+    try:
+        ws.send(json.dumps({
+            'type': 'hello',
+            'segments': detector.segment_names,
+            'connections': [[start, end] for _, start, end in detector.segments],
+            'max_side': MAX_SIDE,
+        }))
+        while True:
+            try:
+                item = frames.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            index, data = item
+            started = time.perf_counter()
+            frame = decode_frame(data)
+            if frame is None:
+                ws.send(json.dumps({'type': 'error', 'frame': index, 'error': 'not a JPEG image'}))
+                continue
+            landmarks, flags = analyze_live_frame(detector, frame)
+            ws.send(json.dumps({
+                'type': 'pose',
+                'frame': index,
+                'landmarks': landmarks,
+                'flags': flags,
+                'ms': round(1000 * (time.perf_counter() - started), 1),
+                'dropped': frames.dropped,
+            }, separators=(',', ':')))
+    except ConnectionClosed:
+        pass
+    finally:
+        detector.pose.close()
@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Drives the analysis service like many patients at once. Start the service against the fake
+# backend first, e.g.  BIONIC_BACKEND=fake python app.py
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_one(url, video, mode):
+    # video is (name, bytes), or None to send fresh random bytes
+    started = time.perf_counter()
+    if video is None:
+        # Random bytes defeat the content-addressed cache so every request does the full work
+        files = {'file': ('loadtest.mp4', os.urandom(256 * 1024))}
+    else:
+        files = {'file': video}
+    response = requests.post(f'{url}/jobs', files=files, data={'mode': mode})
+    if response.status_code != 202:
+        return {'ok': False, 'error': f'submit {response.status_code}'}
+    job_id = response.json()['job_id']
+
+    first_text = None
+    kind = data = None
+    with requests.get(f'{url}/jobs/{job_id}/events', stream=True, timeout=(5, 120)) as events:
+        for line in events.iter_lines(decode_unicode=True):
+            if line.startswith('event:'):
+                kind = line[len('event:'):].strip()
+            elif line.startswith('data:'):
+                data = json.loads(line[len('data:'):])
+                if kind == 'text' and first_text is None:
+                    first_text = time.perf_counter() - started
+                if kind in ('done', 'error'):
+                    break
+    total = time.perf_counter() - started
+    if kind != 'done':
+        return {'ok': False, 'error': f'job {kind}: {data}', 'total': total}
+    return {'ok': True, 'first_text': first_text, 'total': total}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the analysis service")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--video", help="video to submit (default: random bytes per request)")
+    parser.add_argument("--mode", default="video", choices=["video", "keypoints"])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    video = None
+    if args.video is not None:
+        with open(args.video, 'rb') as f:
+            video = (os.path.basename(args.video), f.read())
+    results = []
+    lock = threading.Lock()
+
+    def task(_):
+        try:
+            result = run_one(args.url, video, args.mode)
+        except requests.RequestException as e:
+            result = {'ok': False, 'error': str(e)}
+        with lock:
+            results.append(result)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(task, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if r['ok']]
+    errors = [r['error'] for r in results if not r['ok']]
+    print(f"{len(ok)}/{len(results)} succeeded in {elapsed:.1f}s ({len(ok) / elapsed:.2f} analyses/s)")
+    for name in ('first_text', 'total'):
+        values = [r[name] for r in ok if r.get(name) is not None]
+        if values:
+            print(f"{name:>10}: p50 {percentile(values, 50):.2f}s  p95 {percentile(values, 95):.2f}s  "
+                  f"p99 {percentile(values, 99):.2f}s  mean {statistics.mean(values):.2f}s")
+    for error in sorted(set(errors))[:10]:
+        print(f"error: {error} (x{errors.count(error)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,57 @@
+import argparse
+import sys
+import time
+
 import cv2
 import mediapipe as mp
 import numpy as np
 
+from colors import classify_colors, compile_color_ranges
+from metrics import registry
+from pipeline import run_pipelined
+from quality import QualityController
+from session_store import SessionRecorder
+from smoothing import LandmarkSmoother, landmarks_to_array
+
+FRAME_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.033, 0.05, 0.1, 0.25, 1)
+frame_stage_seconds = registry.histogram("bionic_frame_stage_seconds", "Time spent in each process_frame stage",
+                                         ["stage"], buckets=FRAME_BUCKETS)
+frames_total = registry.counter("bionic_frames_total", "Frames processed, by whether a pose was found", ["pose"])
+
+class FrameResult:
+    # What the detector found in one frame, without touching its pixels. landmarks is a (33, 4)
+    # float32 array of x, y, z, visibility; it and segment_pixels are None and every flag False
+    # when no pose was found.
+    __slots__ = ('landmarks', 'segment_pixels', 'overlap_areas', 'detected')
+
+    def __init__(self, landmarks, segment_pixels, overlap_areas, detected):
+        self.landmarks = landmarks
+        self.segment_pixels = segment_pixels
+        self.overlap_areas = overlap_areas
+        self.detected = detected
+
+    @property
+    def pose_found(self):
+        return self.landmarks is not None
+
 class ProstheticJointDetector:
-    def __init__(self):
+    def __init__(self, use_roi=True, roi_margin=20, inference_interval=1, motion_threshold=None, fps=30.0,
+                 latency_budget_ms=None):
         # Initialize MediaPipe Pose
         self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.7,
-            model_complexity=1
-        )
+        # Optionally trade pose input resolution and model complexity for a steady frame rate
+        self.quality = QualityController(latency_budget_ms) if latency_budget_ms else None
+        self.pose = self.make_pose(self.quality.model_complexity if self.quality else 1)
         self.mp_draw = mp.solutions.drawing_utils
         
         # Define color range specifically for black garbage bag
         self.prosthetic_color_ranges = [
             {'lower': np.array([0, 0, 0]), 'upper': np.array([180, 180, 30])}  # Adjusted for black material
         ]
+        # From this many ranges on, one lookup in a compiled BGR table beats HSV + inRange per range.
+        # inRange runs on every core and the lookup on one, so the crossover moves up with core
+        # count: about 3 ranges on a single core, 8 on a multi-core machine.
+        self.lut_min_ranges = 8
         
         # Only track legs
         self.limb_connections = {
@@ -37,77 +72,314 @@ class ProstheticJointDetector:
                 (self.mp_pose.PoseLandmark.LEFT_KNEE, self.mp_pose.PoseLandmark.LEFT_ANKLE)
             ]
         }
+        # Flat (limb_name, start_index, end_index) list in drawing order
+        self.segments = [
+            (limb_name, start_landmark.value, end_landmark.value)
+            for limb_name, connections in self.limb_connections.items()
+            for start_landmark, end_landmark in connections
+        ]
+        self.segment_names = [f'{limb_name}:{start}-{end}' for limb_name, start, end in self.segments]
+        self.segment_indices = np.array([[start, end] for _, start, end in self.segments])
+        # Landmarks of the current frame, converted in place instead of reallocated every frame
+        self.landmark_buffer = np.empty((33, 4), dtype=np.float32)
+        self.limb_landmarks = sorted({
+            index
+            for _, start_index, end_index in self.segments
+            for index in (start_index, end_index)
+        })
 
-    def detect_prosthetic_color(self, frame):
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        combined_mask = np.zeros(frame.shape[:2], dtype=np.uint8)
-        
-        for color_range in self.prosthetic_color_ranges:
-            mask = cv2.inRange(hsv, color_range['lower'], color_range['upper'])
-            combined_mask = cv2.bitwise_or(combined_mask, mask)
+        self.segment_thickness = 20
+        self.min_area_threshold = 200  # Adjust this value to change sensitivity
+
+        self.morph_kernel = np.ones((5,5), np.uint8)
+        # Open + close is two erodes and two dilates, each reaching half the kernel out
+        self.morph_reach = 4 * (self.morph_kernel.shape[0] // 2)
+
+        # Only build the color mask around the tracked limbs instead of the whole frame
+        self.use_roi = use_roi
+        self.roi_margin = roi_margin
+
+        # Optional session_store.SessionRecorder that keeps every frame's landmarks and flags
+        self.recorder = None
+
+        # Frame skipping: run pose inference at most every inference_interval frames, or sooner
+        # when the mean pixel change since the last inference exceeds motion_threshold.
+        # Skipped frames get extrapolated landmarks, and all landmarks are One Euro smoothed.
+        # A motion threshold on its own makes the interval a maximum gap of one second.
+        if motion_threshold is not None and inference_interval <= 1:
+            inference_interval = max(2, round(fps))
+        self.inference_interval = inference_interval
+        self.motion_threshold = motion_threshold
+        self.smoother = None
+        if inference_interval > 1 or motion_threshold is not None:
+            self.smoother = LandmarkSmoother(fps=fps)
+        self.frame_index = 0
+        self.last_inference_index = None
+        self.last_thumbnail = None
+
+    def make_pose(self, model_complexity):
+        return self.mp_pose.Pose(
+            min_detection_confidence=0.7,
+            min_tracking_confidence=0.7,
+            model_complexity=model_complexity
+        )
+
+    def run_pose(self, frame):
+        if self.quality is None:
+            return self.pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+        image_rgb = cv2.cvtColor(self.quality.prepare(frame), cv2.COLOR_BGR2RGB)
+        started = time.perf_counter()
+        results = self.pose.process(image_rgb)
+        complexity = self.quality.model_complexity
+        if self.quality.record(1000 * (time.perf_counter() - started)):
+            if self.quality.model_complexity != complexity:
+                self.pose.close()
+                self.pose = self.make_pose(self.quality.model_complexity)
+        return results
+
+    def color_mask(self, frame):
+        if len(self.prosthetic_color_ranges) >= self.lut_min_ranges:
+            combined_mask = classify_colors(frame, compile_color_ranges(self.prosthetic_color_ranges))
+        else:
+            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+            combined_mask = np.zeros(frame.shape[:2], dtype=np.uint8)
+            
+            for color_range in self.prosthetic_color_ranges:
+                mask = cv2.inRange(hsv, color_range['lower'], color_range['upper'])
+                combined_mask = cv2.bitwise_or(combined_mask, mask)
         
-        kernel = np.ones((5,5), np.uint8)
-        combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_OPEN, kernel)
-        combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel)
+        combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_OPEN, self.morph_kernel)
+        combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, self.morph_kernel)
         
         return combined_mask
 
+    def pixel_coordinates(self, landmarks, shape):
+        # (33, 2) pixel positions of every landmark at once, truncated like int(lm.x * w)
+        if not isinstance(landmarks, np.ndarray):
+            landmarks = landmarks_to_array(landmarks)
+        h, w = shape[:2]
+        return np.multiply(landmarks[:, :2], (w, h), dtype=np.float64).astype(np.int64)
+
+    def limb_bounding_box(self, pixels, shape):
+        h, w = shape[:2]
+        limb_pixels = pixels[self.limb_landmarks]
+        (min_x, min_y), (max_x, max_y) = limb_pixels.min(axis=0).tolist(), limb_pixels.max(axis=0).tolist()
+
+        # The box has to hold every pixel a segment line can touch, plus the extra margin
+        pad = self.segment_thickness // 2 + 1 + self.roi_margin
+        x0, y0 = max(min_x - pad, 0), max(min_y - pad, 0)
+        x1, y1 = min(max_x + pad + 1, w), min(max_y + pad + 1, h)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return x0, y0, x1, y1
+
+    def detect_prosthetic_color(self, frame, landmarks=None, pixels=None):
+        if landmarks is None or not self.use_roi:
+            return self.color_mask(frame)
+
+        h, w = frame.shape[:2]
+        combined_mask = np.zeros((h, w), dtype=np.uint8)
+        if pixels is None:
+            pixels = self.pixel_coordinates(landmarks, frame.shape)
+        roi = self.limb_bounding_box(pixels, frame.shape)
+        if roi is None:
+            return combined_mask
+
+        # Grow the crop so the morphology sees the same neighbourhood as it would on the full frame
+        x0, y0, x1, y1 = roi
+        cx0, cy0 = max(x0 - self.morph_reach, 0), max(y0 - self.morph_reach, 0)
+        cx1, cy1 = min(x1 + self.morph_reach, w), min(y1 + self.morph_reach, h)
+        crop_mask = self.color_mask(frame[cy0:cy1, cx0:cx1])
+        combined_mask[y0:y1, x0:x1] = crop_mask[y0 - cy0:y1 - cy0, x0 - cx0:x1 - cx0]
+
+        return combined_mask
+
+    def segment_pixels(self, landmarks, shape, pixels=None):
+        if pixels is None:
+            pixels = self.pixel_coordinates(landmarks, shape)
+        return [(tuple(start), tuple(end)) for start, end in pixels[self.segment_indices].tolist()]
+
+    def segment_overlap_areas(self, mask, segment_pixels):
+        h, w = mask.shape[:2]
+        reach = self.segment_thickness // 2 + 1
+        areas = np.zeros(len(segment_pixels), dtype=np.int64)
+
+        # Rasterize each thick line into a patch the size of its own bounding box
+        # rather than into a full-frame mask
+        for i, ((start_x, start_y), (end_x, end_y)) in enumerate(segment_pixels):
+            x0, y0 = max(min(start_x, end_x) - reach, 0), max(min(start_y, end_y) - reach, 0)
+            x1, y1 = min(max(start_x, end_x) + reach + 1, w), min(max(start_y, end_y) + reach + 1, h)
+            if x0 >= x1 or y0 >= y1:
+                continue
+
+            limb_mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+            cv2.line(limb_mask, (start_x - x0, start_y - y0), (end_x - x0, end_y - y0), 255,
+                     thickness=self.segment_thickness)
+            areas[i] = cv2.countNonZero(cv2.bitwise_and(mask[y0:y1, x0:x1], limb_mask))
+
+        return areas
+
     def check_prosthetic_in_region(self, frame, mask, start_point, end_point):
         h, w = frame.shape[:2]
-        start_x, start_y = int(start_point.x * w), int(start_point.y * h)
-        end_x, end_y = int(end_point.x * w), int(end_point.y * h)
-        
-        limb_mask = np.zeros_like(mask)
-        cv2.line(limb_mask, (start_x, start_y), (end_x, end_y), 255, thickness=20)
-        
-        overlap = cv2.bitwise_and(mask, limb_mask)
-        overlap_area = np.sum(overlap > 0)
-        min_area_threshold = 200  # Adjust this value to change sensitivity
+        start_px = (int(start_point.x * w), int(start_point.y * h))
+        end_px = (int(end_point.x * w), int(end_point.y * h))
+
+        overlap_area = self.segment_overlap_areas(mask, [(start_px, end_px)])[0]
         
-        return overlap_area > min_area_threshold
+        return overlap_area > self.min_area_threshold
 
-    def process_frame(self, frame):
-        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.pose.process(image_rgb)
+    def should_infer(self, index, thumbnail):
+        if self.last_inference_index is None or not self.smoother.keyframes:
+            return True
+        if index - self.last_inference_index >= self.inference_interval:
+            return True
+        if thumbnail is not None:
+            motion = cv2.absdiff(thumbnail, self.last_thumbnail).mean()
+            return motion > self.motion_threshold
+        return False
+
+    def estimate_landmarks(self, frame):
+        # Returns landmark_buffer filled with this frame's landmarks, or None without a pose
+        if self.smoother is None:
+            results = self.run_pose(frame)
+            if not results.pose_landmarks:
+                return None
+            return landmarks_to_array(results.pose_landmarks.landmark, self.landmark_buffer)
+
+        index = self.frame_index
+        self.frame_index += 1
+
+        thumbnail = None
+        if self.motion_threshold is not None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            thumbnail = cv2.resize(gray, (64, 48), interpolation=cv2.INTER_AREA)
+
+        if not self.should_infer(index, thumbnail):
+            self.landmark_buffer[:] = self.smoother.predict(index)
+            return self.landmark_buffer
+
+        self.last_inference_index = index
+        self.last_thumbnail = thumbnail
+        results = self.run_pose(frame)
+        if not results.pose_landmarks:
+            self.smoother.reset()
+            return None
+        # The smoother keeps keyframes, so this one gets its own array
+        landmarks = landmarks_to_array(results.pose_landmarks.landmark)
+        self.landmark_buffer[:] = self.smoother.update(index, landmarks)
+        return self.landmark_buffer
+
+    def draw_detections(self, frame, segment_pixels, detected):
+        lines = [np.array(points, dtype=np.int32) for points, is_detected in zip(segment_pixels, detected)
+                 if is_detected]
+        if not lines:
+            return frame
+        # Draw green lines for detected segments, all in one call
+        cv2.polylines(frame, lines, False, (0, 255, 0), 4)
+
+        for (limb_name, _, _), (start_px, end_px), is_detected in zip(
+                self.segments, segment_pixels, detected):
+            if is_detected:
+                # Add text label
+                mid_x = (start_px[0] + end_px[0]) // 2
+                mid_y = (start_px[1] + end_px[1]) // 2 
+                cv2.putText(frame, 
+                        limb_name, 
+                        (mid_x - 40, mid_y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX,
+                        0.5,
+                        (0, 255, 0),
+                        2)
+        return frame
+
+    def detect(self, frame):
+        with frame_stage_seconds.time(stage="pose"):
+            landmarks = self.estimate_landmarks(frame)
         
-        if results.pose_landmarks:
-            prosthetic_mask = self.detect_prosthetic_color(frame)
+        if landmarks is not None:
+            pixels = self.pixel_coordinates(landmarks, frame.shape)
+            with frame_stage_seconds.time(stage="color_mask"):
+                prosthetic_mask = self.detect_prosthetic_color(frame, landmarks, pixels)
             
-            landmarks = results.pose_landmarks.landmark
-            for limb_name, connections in self.limb_connections.items():
-                for start_landmark, end_landmark in connections:
-                    if self.check_prosthetic_in_region(
-                        frame, 
-                        prosthetic_mask,
-                        landmarks[start_landmark.value],
-                        landmarks[end_landmark.value]
-                    ):
-                        h, w = frame.shape[:2]
-                        start_point = landmarks[start_landmark.value]
-                        end_point = landmarks[end_landmark.value]
-                        
-                        start_px = (int(start_point.x * w), int(start_point.y * h))
-                        end_px = (int(end_point.x * w), int(end_point.y * h))
-                        
-                        # Draw green line for detected segment
-                        cv2.line(frame, start_px, end_px, (0, 255, 0), 4)
-                        
-                        # Add text label
-                        mid_x = (start_px[0] + end_px[0]) // 2
-                        mid_y = (start_px[1] + end_px[1]) // 2 
-                        cv2.putText(frame, 
-                                limb_name, 
-                                (mid_x - 40, mid_y - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX,
-                                0.5,
-                                (0, 255, 0),
-                                2)
-        
+            with frame_stage_seconds.time(stage="segment_scoring"):
+                segment_pixels = self.segment_pixels(landmarks, frame.shape, pixels)
+                overlap_areas = self.segment_overlap_areas(prosthetic_mask, segment_pixels)
+
+            # The buffer is refilled next frame, so the result keeps a copy
+            result = FrameResult(landmarks.copy(), segment_pixels, overlap_areas,
+                                 overlap_areas > self.min_area_threshold)
+            frames_total.inc(pose="yes")
+        else:
+            result = FrameResult(None, None, np.zeros(len(self.segments), dtype=np.int64),
+                                 np.zeros(len(self.segments), dtype=bool))
+            frames_total.inc(pose="no")
+
+        if self.recorder is not None:
+            self.recorder.write(result.landmarks, result.detected)
+        return result
+
+    def render(self, frame, result):
+        if result.pose_found:
+            with frame_stage_seconds.time(stage="drawing"):
+                self.draw_detections(frame, result.segment_pixels, result.detected)
         return frame
 
+    def process_frame(self, frame):
+        return self.render(frame, self.detect(frame))
+
+def parse_source(source):
+    return int(source) if source.isdigit() else source
+
 def main():
-    cap = cv2.VideoCapture(0)
-    detector = ProstheticJointDetector()
+    parser = argparse.ArgumentParser(description="Live prosthetic segment detection")
+    parser.add_argument("--source", default="0", help="camera index or video file")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="run capture, inference and display on separate threads")
+    parser.add_argument("--record", metavar="PATH",
+                        help="save landmarks and segment flags to a session file")
+    parser.add_argument("--infer-every", type=int, default=1,
+                        help="run pose inference at most every N frames and interpolate the rest")
+    parser.add_argument("--motion-threshold", type=float,
+                        help="run pose inference early when mean pixel change exceeds this (0-255); "
+                             "without --infer-every, inference otherwise runs once a second")
+    parser.add_argument("--latency-budget", type=float, metavar="MS",
+                        help="adapt pose resolution and model complexity to keep inference under this")
+    parser.add_argument("--headless", action="store_true",
+                        help="no window and no drawing; print detection stats instead")
+    args = parser.parse_args()
+
+    source = parse_source(args.source)
+    detector = ProstheticJointDetector(inference_interval=args.infer_every,
+                                       motion_threshold=args.motion_threshold,
+                                       latency_budget_ms=args.latency_budget)
+    if args.record:
+        probe = cv2.VideoCapture(source)
+        detector.recorder = SessionRecorder(
+            args.record,
+            detector.segment_names,
+            fps=probe.get(cv2.CAP_PROP_FPS) or 30.0,
+            width=int(probe.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(probe.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+        probe.release()
+
+    ok = True
+    try:
+        if args.pipelined:
+            ok = run_pipelined(detector, source, headless=args.headless)
+        elif args.headless:
+            run_headless(detector, source)
+        else:
+            run_serial(detector, source)
+    finally:
+        if detector.recorder is not None:
+            detector.recorder.close()
+    if not ok:
+        sys.exit(1)
+
+def run_serial(detector, source=0):
+    cap = cv2.VideoCapture(source)
     
     while True:
         ret, frame = cap.read()
@@ -123,5 +395,36 @@ def main():
     cap.release()
     cv2.destroyAllWindows()
 
+def run_headless(detector, source=0, report_every=5.0):
+    # Detection only, for servers and batch runs: Ctrl+C or the end of the source stops it
+    cap = cv2.VideoCapture(source)
+    frames = posed = 0
+    detections = np.zeros(len(detector.segments), dtype=np.int64)
+    started = last_report = time.perf_counter()
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            result = detector.detect(frame)
+            frames += 1
+            posed += result.pose_found
+            detections += result.detected
+
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                print(f'{frames} frames, {frames / (now - started):.1f} fps')
+                last_report = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cap.release()
+
+    elapsed = time.perf_counter() - started
+    print(f'{frames} frames in {elapsed:.1f}s ({frames / elapsed if elapsed else 0:.1f} fps), '
+          f'pose found in {posed}')
+    for name, count in zip(detector.segment_names, detections):
+        print(f'  {name:<16} prosthetic in {count / frames if frames else 0:.0%} of frames')
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,203 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+class LatestFrameQueue:
+    # Bounded queue where a full put evicts the oldest item, so consumers always see the newest frame
+    def __init__(self, maxsize=1):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def close(self):
+        self.closed = True
+
+    def get(self, timeout=None):
+        # Returns None once the queue is closed and drained, raises queue.Empty otherwise
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            if self.closed and self.queue.empty():
+                return None
+            raise
+
+
+class StageCounter:
+    def __init__(self, name, window=30):
+        self.name = name
+        self.count = 0
+        self.times = deque(maxlen=window)
+
+    def tick(self):
+        self.count += 1
+        self.times.append(time.perf_counter())
+
+    @property
+    def fps(self):
+        if len(self.times) < 2:
+            return 0.0
+        elapsed = self.times[-1] - self.times[0]
+        return (len(self.times) - 1) / elapsed if elapsed > 0 else 0.0
+
+
+class FramePipeline:
+    def __init__(self, detector, source=0, queue_size=1, render=True):
+        self.detector = detector
+        self.source = source
+        # Without rendering the results queue carries FrameResults instead of annotated frames
+        self.render = render
+        self.frames = LatestFrameQueue(queue_size)
+        self.results = LatestFrameQueue(queue_size)
+        self.capture_stage = StageCounter('capture')
+        self.inference_stage = StageCounter('inference')
+        self.display_stage = StageCounter('display')
+        self.latency = deque(maxlen=30)
+        self.stop_event = threading.Event()
+        self.threads = []
+        # Exception that ended the inference thread, if any
+        self.error = None
+
+    @property
+    def stages(self):
+        return [self.capture_stage, self.inference_stage, self.display_stage]
+
+    def start(self):
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name='capture', daemon=True),
+            threading.Thread(target=self._inference_loop, name='inference', daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=2)
+
+    def _capture_loop(self):
+        cap = cv2.VideoCapture(self.source)
+        # Keep the driver from holding on to stale frames
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                self.capture_stage.tick()
+                self.frames.put((time.perf_counter(), frame))
+        finally:
+            cap.release()
+            self.frames.close()
+
+    def _inference_loop(self):
+        # Closing results on the way out, even after an error, is what ends the display loop
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    item = self.frames.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    break
+                captured_at, frame = item
+                if self.render:
+                    output = self.detector.process_frame(frame)
+                else:
+                    output = self.detector.detect(frame)
+                self.inference_stage.tick()
+                self.results.put((captured_at, output))
+        except BaseException as e:
+            self.error = e
+            raise
+        finally:
+            self.results.close()
+
+    def get_result(self, timeout=0.1):
+        # Returns (captured_at, frame or FrameResult), None once the source is exhausted, or
+        # raises queue.Empty
+        item = self.results.get(timeout=timeout)
+        if item is not None:
+            self.display_stage.tick()
+            self.latency.append(time.perf_counter() - item[0])
+        return item
+
+    def stats_text(self):
+        parts = [f'{stage.name} {stage.fps:.1f} fps' for stage in self.stages]
+        if self.latency:
+            parts.append(f'latency {1000 * sum(self.latency) / len(self.latency):.0f} ms')
+        return ' | '.join(parts)
+
+
+def _drain_headless(pipeline, report_every):
+    last_report = time.perf_counter()
+    try:
+        while True:
+            try:
+                item = pipeline.get_result()
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            if time.perf_counter() - last_report >= report_every:
+                print(pipeline.stats_text())
+                last_report = time.perf_counter()
+    except KeyboardInterrupt:
+        pass
+
+
+def run_pipelined(detector, source=0, headless=False, report_every=5.0):
+    # imshow/waitKey have to stay on the main thread, so display runs here.
+    # Returns False when inference failed.
+    pipeline = FramePipeline(detector, source, render=not headless)
+    pipeline.start()
+    try:
+        if headless:
+            _drain_headless(pipeline, report_every)
+            return pipeline.error is None
+        while True:
+            try:
+                item = pipeline.get_result()
+            except queue.Empty:
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+                continue
+            if item is None:
+                break
+
+            _, processed_frame = item
+            cv2.putText(processed_frame,
+                    pipeline.stats_text(),
+                    (10, 20),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5,
+                    (255, 255, 255),
+                    1)
+            cv2.imshow('Prosthetic Detection', processed_frame)
+
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        pipeline.stop()
+        if not headless:
+            cv2.destroyAllWindows()
+        print(pipeline.stats_text())
+        print(f'dropped {pipeline.frames.dropped} captured / {pipeline.results.dropped} processed frames')
+        if pipeline.error is not None:
+            print(f'inference failed: {pipeline.error!r}')
+    return pipeline.error is None
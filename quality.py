@@ -0,0 +1,87 @@
+import cv2
+
+# (model_complexity, longest side of the pose input in pixels or None for full resolution),
+# ordered from cheapest to most accurate
+QUALITY_LEVELS = [
+    (0, 256),
+    (0, 384),
+    (0, 512),
+    (1, 512),
+    (1, 768),
+    (1, None),
+    (2, None),
+]
+DEFAULT_LEVEL = QUALITY_LEVELS.index((1, None))
+
+
+class QualityController:
+    # Steps pose input resolution and model_complexity to keep inference latency under budget.
+    # Downgrades react quickly; upgrades need a long stretch of headroom, so it does not oscillate.
+    def __init__(self, budget_ms=33.0, level=DEFAULT_LEVEL, headroom=0.6,
+                 down_after=10, up_after=60, smoothing=0.2, warmup=3):
+        self.budget_ms = budget_ms
+        self.level = level
+        self.headroom = headroom
+        self.down_after = down_after
+        self.up_after = up_after
+        self.smoothing = smoothing
+        # The first inferences after building a Pose graph or changing input size are much
+        # slower than the rest, so they are left out of the average
+        self.warmup = warmup
+        self.ema_ms = None
+        self.frames_at_level = 0
+        # How often an upgrade to each level had to be undone; retrying it waits exponentially longer
+        self.failures = [0] * len(QUALITY_LEVELS)
+        self.upgraded = False
+
+    @property
+    def model_complexity(self):
+        return QUALITY_LEVELS[self.level][0]
+
+    @property
+    def max_side(self):
+        return QUALITY_LEVELS[self.level][1]
+
+    def prepare(self, frame):
+        # Downscaling keeps the aspect ratio, so MediaPipe's normalized landmark coordinates
+        # already map straight back onto the original frame
+        h, w = frame.shape[:2]
+        if self.max_side is None or max(h, w) <= self.max_side:
+            return frame
+        scale = self.max_side / max(h, w)
+        return cv2.resize(frame, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+
+    def record(self, latency_ms):
+        # Returns True when the level changed
+        self.frames_at_level += 1
+        if self.frames_at_level <= self.warmup:
+            return False
+        if self.ema_ms is None:
+            self.ema_ms = latency_ms
+        else:
+            self.ema_ms += self.smoothing * (latency_ms - self.ema_ms)
+        measured = self.frames_at_level - self.warmup
+
+        if (self.ema_ms > self.budget_ms and self.level > 0
+                and measured >= self.down_after):
+            return self._step(-1)
+        if (self.ema_ms < self.budget_ms * self.headroom and self.level < len(QUALITY_LEVELS) - 1
+                and measured >= self.up_after * 2 ** self.failures[self.level + 1]):
+            return self._step(1)
+        return False
+
+    def _step(self, direction):
+        # Only a level we upgraded to counts as failed; the starting level was never a choice
+        if direction < 0 and self.upgraded:
+            self.failures[self.level] += 1
+        self.upgraded = direction > 0
+        self.level += direction
+        self.frames_at_level = 0
+        # Latency at the new level is unknown, so start measuring afresh
+        self.ema_ms = None
+        return True
+
+    def describe(self):
+        side = self.max_side or 'full'
+        ema = f'{self.ema_ms:.0f} ms' if self.ema_ms is not None else '-'
+        return f'complexity {self.model_complexity}, input {side}, inference {ema}'
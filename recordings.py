@@ -0,0 +1,104 @@
+import os
+import re
+import threading
+
+RECORDING_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class OffsetMismatch(Exception):
+    def __init__(self, received):
+        super().__init__(f'server has {received} bytes')
+        self.received = received
+
+
+class RecordingStore:
+    # Recordings the browser uploads chunk by chunk while the patient is still recording.
+    # Every chunk carries the byte offset it starts at, so after a dropped connection the
+    # client asks how much arrived and resends from there. State lives entirely on disk:
+    # <id>.part while recording, <id><suffix> once finished. An optional listener is told
+    # started(id, part_path), appended(id, received) and finished(id, finished_path), in upload
+    # order, where received is the size of the part file after the append.
+    def __init__(self, directory, suffix='.webm', listener=None):
+        self.directory = directory
+        self.suffix = suffix
+        self.listener = listener
+        self.locks = {}
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def valid(self, recording_id):
+        return bool(RECORDING_ID.match(recording_id))
+
+    def _lock(self, recording_id):
+        with self.lock:
+            return self.locks.setdefault(recording_id, threading.Lock())
+
+    def part_path(self, recording_id):
+        return os.path.join(self.directory, f'{recording_id}.part')
+
+    def finished_path(self, recording_id):
+        return os.path.join(self.directory, f'{recording_id}{self.suffix}')
+
+    def start(self, recording_id):
+        # Starting again under the same id discards the previous take
+        with self._lock(recording_id):
+            if os.path.exists(self.finished_path(recording_id)):
+                os.remove(self.finished_path(recording_id))
+            open(self.part_path(recording_id), 'wb').close()
+            if self.listener is not None:
+                self.listener.started(recording_id, self.part_path(recording_id))
+
+    def status(self, recording_id):
+        if os.path.exists(self.part_path(recording_id)):
+            return {'received': os.path.getsize(self.part_path(recording_id)), 'complete': False}
+        if os.path.exists(self.finished_path(recording_id)):
+            return {'received': os.path.getsize(self.finished_path(recording_id)), 'complete': True}
+        return None
+
+    def append(self, recording_id, offset, data):
+        # Returns the number of bytes stored. Chunks that were already received (a retry after
+        # the response was lost) are acknowledged without writing anything.
+        with self._lock(recording_id):
+            path = self.part_path(recording_id)
+            if not os.path.exists(path):
+                raise KeyError(recording_id)
+            received = os.path.getsize(path)
+            if offset > received:
+                raise OffsetMismatch(received)
+            new = data[received - offset:]
+            if new:
+                with open(path, 'ab') as f:
+                    f.write(new)
+                if self.listener is not None:
+                    self.listener.appended(recording_id, received + len(new))
+            return received + len(new)
+
+    def finish(self, recording_id, size=None):
+        with self._lock(recording_id):
+            path = self.part_path(recording_id)
+            if not os.path.exists(path):
+                if os.path.exists(self.finished_path(recording_id)):
+                    return self.finished_path(recording_id)
+                raise KeyError(recording_id)
+            received = os.path.getsize(path)
+            if size is not None and received != size:
+                raise OffsetMismatch(received)
+            os.replace(path, self.finished_path(recording_id))
+            if self.listener is not None:
+                self.listener.finished(recording_id, self.finished_path(recording_id))
+            return self.finished_path(recording_id)
+
+    def recording_id(self, path):
+        # Inverse of finished_path, None for files that did not come through the store
+        directory, name = os.path.split(os.path.abspath(path))
+        recording_id = name[:-len(self.suffix)] if name.endswith(self.suffix) else ''
+        if directory != os.path.abspath(self.directory) or not self.valid(recording_id):
+            return None
+        return recording_id
+
+    def path(self, recording_id):
+        # The finished file, or None while it is still being uploaded
+        status = self.status(recording_id)
+        if status is None or not status['complete']:
+            return None
+        return self.finished_path(recording_id)
@@ -4,11 +4,10 @@ import hashlib
 import time
 import requests
 import base64
+import json
 from io import BytesIO
-import cv2
-import mediapipe as mp
-import numpy as np
 import os
+import uuid
 
 # Page config remains the same
 st.set_page_config(
@@ -19,9 +18,7 @@ st.set_page_config(
 )
 
 # Updated CSS with horizontally narrower forms
-st.markdown(
-    """
-    <style>
+PORTAL_CSS = """
         .reportview-container {
             background-color: #181818;
         }
@@ -174,10 +171,30 @@ st.markdown(
             display: flex;
             justify-content: center;
         }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+"""
+
+def inject_css():
+    # The stylesheet is added to the parent page's <head>, where it survives reruns, so it is
+    # sent once per browser session rather than with every click
+    if st.session_state.get("css_injected"):
+        return
+    components.html(
+        f"""
+        <script>
+            const doc = window.parent.document;
+            if (!doc.getElementById("bionic-css")) {{
+                const style = doc.createElement("style");
+                style.id = "bionic-css";
+                style.textContent = {json.dumps(PORTAL_CSS)};
+                doc.head.appendChild(style);
+            }}
+        </script>
+        """,
+        height=0,
+    )
+    st.session_state.css_injected = True
+
+inject_css()
 
 # Initialize session state
 if 'logged_in' not in st.session_state:
@@ -190,10 +207,54 @@ if 'chat_history' not in st.session_state:
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
-def get_text():
+ANALYSIS_URL = os.environ.get("BIONIC_ANALYSIS_URL", "http://localhost:5000")
+# Where the patient's browser reaches the analysis service to upload recordings
+PUBLIC_ANALYSIS_URL = os.environ.get("BIONIC_PUBLIC_ANALYSIS_URL", ANALYSIS_URL)
+
+def read_events(response):
+    # Minimal server-sent events parser yielding (event, decoded JSON data)
+    kind, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield kind, json.loads("\n".join(data))
+            kind, data = "message", []
+        elif line.startswith("event:"):
+            kind = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+def recording_status(recording_id):
     try:
-        response = requests.get("http://localhost:5000/get_text")
-        return response.json()["text"]
+        response = requests.get(f"{ANALYSIS_URL}/recordings/{recording_id}", timeout=5)
+    except requests.RequestException:
+        return None
+    return response.json() if response.ok else None
+
+def get_text(status, output, mode="video", recording=None):
+    # Submit an analysis job and render its answer chunk by chunk as Gemini generates it
+    try:
+        data = {"mode": mode}
+        if recording is not None:
+            data["recording"] = recording
+        response = requests.post(f"{ANALYSIS_URL}/jobs", data=data)
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+
+        text = ""
+        with requests.get(f"{ANALYSIS_URL}/jobs/{job_id}/events", stream=True, timeout=(5, 60)) as events:
+            for kind, data in read_events(events):
+                if kind == "stage":
+                    status.write(f"Analysis {data}...")
+                elif kind == "text":
+                    status.empty()
+                    text += data
+                    output.markdown(text)
+                elif kind == "error":
+                    return f"Analysis failed: {data}"
+                elif kind == "done":
+                    break
+        return text
     except requests.RequestException as e:
         return f"Error fetching text: {str(e)}"
 
@@ -211,10 +272,17 @@ def display_chat_message(message, is_user=True):
 def show_video_recording():
     st.markdown("<h2 style=color:lightblue>📹 Video Recording</h2>", unsafe_allow_html=True)
 
-    html_code = """
+    # Chunks are uploaded to the analysis service under this id while the patient records
+    if 'recording_id' not in st.session_state:
+        st.session_state.recording_id = uuid.uuid4().hex
+    recording_url = f"{PUBLIC_ANALYSIS_URL}/recordings/{st.session_state.recording_id}"
+    live_url = PUBLIC_ANALYSIS_URL.replace("http", "ws", 1) + "/live"
+
+    html_code = f"<script>const recordingUrl = {json.dumps(recording_url)}; const liveUrl = {json.dumps(live_url)};</script>" + """
         <div class="video-container" style="position: relative;">
             <div id="redDot" style="height: 12px; width: 12px; background-color: red; border-radius: 50%; display: none; position: absolute; top: 10px; left: 10px;"></div>
             <video id="player" autoplay playsinline style="border: 2px solid #34495E; border-radius: 10px; width: 100%;"></video>
+            <canvas id="overlay" style="position: absolute; top: 0; left: 0; pointer-events: none;"></canvas>
             <div class="button-container">
                 <button id="startBtn" class="record-button" onclick="startRecording()">
                     Start Recording
@@ -223,6 +291,7 @@ def show_video_recording():
                     Stop Recording 
                 </button>
             </div>
+            <div id="uploadStatus" style="color: lightblue; margin-top: 8px;"></div>
             <a id="download" href="#" style="display:none;">Download Recording</a>
         </div>
         
@@ -230,8 +299,165 @@ def show_video_recording():
             let mediaRecorder;
             let recordedBlobs = [];
 
-            function startRecording() {
+            // Upload state: chunks not yet acknowledged, each with the byte offset it starts at
+            let pending = [];
+            let produced = 0;
+            let uploading = null;
+
+            function setUploadStatus(text) {
+                document.getElementById("uploadStatus").textContent = text;
+            }
+
+            function sleep(ms) {
+                return new Promise(resolve => setTimeout(resolve, ms));
+            }
+
+            function resync(received) {
+                // Drop what the server already has and trim a partially stored chunk.
+                // Returns false when the server is missing bytes we no longer hold.
+                while (pending.length && pending[0].offset + pending[0].blob.size <= received) {
+                    pending.shift();
+                }
+                if (pending.length && pending[0].offset < received) {
+                    pending[0].blob = pending[0].blob.slice(received - pending[0].offset);
+                    pending[0].offset = received;
+                }
+                return !pending.length || pending[0].offset === received;
+            }
+
+            async function uploadPending() {
+                let failures = 0;
+                while (pending.length) {
+                    const chunk = pending[0];
+                    let response;
+                    try {
+                        response = await fetch(`${recordingUrl}/chunks?offset=${chunk.offset}`, {
+                            method: "POST", body: chunk.blob
+                        });
+                    } catch (error) {
+                        // Connection dropped: back off, then ask the server where to resume
+                        failures += 1;
+                        setUploadStatus("Connection lost, retrying upload...");
+                        await sleep(Math.min(30000, 500 * 2 ** failures));
+                        try {
+                            const response = await fetch(recordingUrl);
+                            if (response.ok) {
+                                resync((await response.json()).received);
+                            }
+                        } catch (ignored) {}
+                        continue;
+                    }
+                    const body = await response.json();
+                    if (!(response.ok || response.status === 409) || !resync(body.received)) {
+                        pending = [];
+                        setUploadStatus("Upload failed, the recording is only available for download.");
+                        return;
+                    }
+                    failures = 0;
+                }
+                setUploadStatus("");
+            }
+
+            function pumpUploads() {
+                if (!uploading) {
+                    uploading = uploadPending().finally(() => { uploading = null; });
+                }
+                return uploading;
+            }
+
+            async function finishUpload() {
+                setUploadStatus("Finishing upload...");
+                while (pending.length || uploading) {
+                    await pumpUploads();
+                }
+                const response = await fetch(`${recordingUrl}/complete?size=${produced}`, { method: "POST" });
+                setUploadStatus(response.ok ? "Recording uploaded and ready to analyse." : "Upload failed, please record again.");
+            }
+
+            // Live overlay: frames go to the analysis service one at a time (the next is only sent
+            // once the previous answer arrives) and the returned segments are drawn over the video
+            let live = null;
+            const frameCanvas = document.createElement("canvas");
+
+            function sendLiveFrame() {
+                const player = document.getElementById("player");
+                if (!live || live.readyState !== WebSocket.OPEN) {
+                    return;
+                }
+                if (!player.videoWidth) {
+                    // Camera not delivering frames yet
+                    setTimeout(sendLiveFrame, 100);
+                    return;
+                }
+                const scale = Math.min(1, live.maxSide / Math.max(player.videoWidth, player.videoHeight));
+                frameCanvas.width = Math.round(player.videoWidth * scale);
+                frameCanvas.height = Math.round(player.videoHeight * scale);
+                frameCanvas.getContext("2d").drawImage(player, 0, 0, frameCanvas.width, frameCanvas.height);
+                frameCanvas.toBlob(blob => {
+                    if (blob && live && live.readyState === WebSocket.OPEN) {
+                        live.send(blob);
+                    }
+                }, "image/jpeg", 0.7);
+            }
+
+            function drawOverlay(message) {
+                const player = document.getElementById("player");
+                const overlay = document.getElementById("overlay");
+                overlay.width = player.clientWidth;
+                overlay.height = player.clientHeight;
+                const context = overlay.getContext("2d");
+                context.clearRect(0, 0, overlay.width, overlay.height);
+                if (!message.landmarks) {
+                    return;
+                }
+                const point = i => [message.landmarks[3 * i] * overlay.width, message.landmarks[3 * i + 1] * overlay.height];
+                context.lineWidth = 4;
+                live.connections.forEach(([start, end], i) => {
+                    context.strokeStyle = (message.flags >> i) & 1 ? "#00ff00" : "#ff0000";
+                    context.beginPath();
+                    context.moveTo(...point(start));
+                    context.lineTo(...point(end));
+                    context.stroke();
+                });
+            }
+
+            function startLive() {
+                try {
+                    live = new WebSocket(liveUrl);
+                } catch (error) {
+                    return;
+                }
+                live.onmessage = (event) => {
+                    const message = JSON.parse(event.data);
+                    if (message.type === "hello") {
+                        live.connections = message.connections;
+                        live.maxSide = message.max_side;
+                    } else if (message.type === "pose") {
+                        drawOverlay(message);
+                    }
+                    sendLiveFrame();
+                };
+                live.onclose = () => { live = null; };
+            }
+
+            function stopLive() {
+                if (live) {
+                    live.close();
+                    live = null;
+                }
+                const overlay = document.getElementById("overlay");
+                overlay.getContext("2d").clearRect(0, 0, overlay.width, overlay.height);
+            }
+
+            async function startRecording() {
                 recordedBlobs = [];
+                pending = [];
+                produced = 0;
+                try {
+                    await fetch(recordingUrl, { method: "PUT" });
+                } catch (error) {
+                    setUploadStatus("Analysis service unreachable; the recording will only be available for download.");
+                }
                 navigator.mediaDevices.getUserMedia({ 
                     video: true, 
                     audio: false
@@ -243,10 +469,15 @@ def show_video_recording():
                     mediaRecorder.ondataavailable = (event) => {
                         if (event.data && event.data.size > 0) {
                             recordedBlobs.push(event.data);
+                            pending.push({ offset: produced, blob: event.data });
+                            produced += event.data.size;
+                            pumpUploads();
                         }
                     };
 
-                    mediaRecorder.start();
+                    // Emit a chunk every second so the upload keeps pace with the recording
+                    mediaRecorder.start(1000);
+                    startLive();
                     document.getElementById("redDot").style.display = "block";
                     document.getElementById("startBtn").disabled = true;
                     document.getElementById("stopBtn").disabled = false;
@@ -259,6 +490,7 @@ def show_video_recording():
 
             function stopRecording() {
                 mediaRecorder.stop();
+                stopLive();
                 document.getElementById("redDot").style.display = "none";
 
                 mediaRecorder.onstop = () => {
@@ -272,13 +504,28 @@ def show_video_recording():
 
                     document.getElementById("startBtn").disabled = false;
                     document.getElementById("stopBtn").disabled = true;
+                    finishUpload();
                 };
             }
         </script>
     """
     components.html(html_code, height=800)  # Reduced height for the video section
+    analysis_mode = st.radio(
+        "Analysis mode",
+        ["Full video", "Pose keypoints (faster)"],
+        help="Keypoint mode analyses your movement on our server and only sends joint angles to the AI."
+    )
     if(st.button("Get Analysis")):
-        st.write(get_text())
+        status = st.empty()
+        output = st.empty()
+        recording = recording_status(st.session_state.recording_id)
+        if recording is not None and not recording["complete"]:
+            status.warning("Your recording is still uploading, please try again in a moment.")
+        else:
+            text = get_text(status, output, "keypoints" if analysis_mode.startswith("Pose") else "video",
+                            st.session_state.recording_id if recording is not None else None)
+            status.empty()
+            output.write(text)
     st.markdown('</div>', unsafe_allow_html=True)
 
 def show_chatbot():
@@ -476,109 +723,3 @@ def main():
 # Run the main function
 if __name__ == "__main__":
     main()
-
-
-
-
-class ProstheticJointDetector:
-    def __init__(self):
-        # Initialize MediaPipe Pose
-        self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.7,
-            model_complexity=1
-        )
-        self.mp_draw = mp.solutions.drawing_utils
-        
-        # Define color range specifically for black garbage bag
-        self.prosthetic_color_ranges = [
-            {'lower': np.array([0, 0, 0]), 'upper': np.array([180, 180, 30])}  # Adjusted for black material
-        ]
-        
-        # Only track legs
-        self.limb_connections = {
-            'right_arm': [
-        (self.mp_pose.PoseLandmark.RIGHT_SHOULDER, self.mp_pose.PoseLandmark.RIGHT_ELBOW),
-        (self.mp_pose.PoseLandmark.RIGHT_ELBOW, self.mp_pose.PoseLandmark.RIGHT_WRIST)
-    ],
-    'left_arm': [
-        (self.mp_pose.PoseLandmark.LEFT_SHOULDER, self.mp_pose.PoseLandmark.LEFT_ELBOW),
-        (self.mp_pose.PoseLandmark.LEFT_ELBOW, self.mp_pose.PoseLandmark.LEFT_WRIST)
-    ],
-            'right_leg': [
-                (self.mp_pose.PoseLandmark.RIGHT_HIP, self.mp_pose.PoseLandmark.RIGHT_KNEE),
-                (self.mp_pose.PoseLandmark.RIGHT_KNEE, self.mp_pose.PoseLandmark.RIGHT_ANKLE)
-            ],
-            'left_leg': [
-                (self.mp_pose.PoseLandmark.LEFT_HIP, self.mp_pose.PoseLandmark.LEFT_KNEE),
-                (self.mp_pose.PoseLandmark.LEFT_KNEE, self.mp_pose.PoseLandmark.LEFT_ANKLE)
-            ]
-        }
-
-    def detect_prosthetic_color(self, frame):
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        combined_mask = np.zeros(frame.shape[:2], dtype=np.uint8)
-        
-        for color_range in self.prosthetic_color_ranges:
-            mask = cv2.inRange(hsv, color_range['lower'], color_range['upper'])
-            combined_mask = cv2.bitwise_or(combined_mask, mask)
-        
-        kernel = np.ones((5,5), np.uint8)
-        combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_OPEN, kernel)
-        combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel)
-        
-        return combined_mask
-
-    def check_prosthetic_in_region(self, frame, mask, start_point, end_point):
-        h, w = frame.shape[:2]
-        start_x, start_y = int(start_point.x * w), int(start_point.y * h)
-        end_x, end_y = int(end_point.x * w), int(end_point.y * h)
-        
-        limb_mask = np.zeros_like(mask)
-        cv2.line(limb_mask, (start_x, start_y), (end_x, end_y), 255, thickness=20)
-        
-        overlap = cv2.bitwise_and(mask, limb_mask)
-        overlap_area = np.sum(overlap > 0)
-        min_area_threshold = 200  # Adjust this value to change sensitivity
-        
-        return overlap_area > min_area_threshold
-
-    def process_frame(self, frame):
-        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.pose.process(image_rgb)
-        
-        if results.pose_landmarks:
-            prosthetic_mask = self.detect_prosthetic_color(frame)
-            
-            landmarks = results.pose_landmarks.landmark
-            for limb_name, connections in self.limb_connections.items():
-                for start_landmark, end_landmark in connections:
-                    if self.check_prosthetic_in_region(
-                        frame, 
-                        prosthetic_mask,
-                        landmarks[start_landmark.value],
-                        landmarks[end_landmark.value]
-                    ):
-                        h, w = frame.shape[:2]
-                        start_point = landmarks[start_landmark.value]
-                        end_point = landmarks[end_landmark.value]
-                        
-                        start_px = (int(start_point.x * w), int(start_point.y * h))
-                        end_px = (int(end_point.x * w), int(end_point.y * h))
-                        
-                        # Draw green line for detected segment
-                        cv2.line(frame, start_px, end_px, (0, 255, 0), 4)
-                        
-                        # Add text label
-                        mid_x = (start_px[0] + end_px[0]) // 2
-                        mid_y = (start_px[1] + end_px[1]) // 2 
-                        cv2.putText(frame, 
-                                limb_name, 
-                                (mid_x - 40, mid_y - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX,
-                                0.5,
-                                (0, 255, 0),
-                                2)
-        
-        return frame
\ No newline at end of file
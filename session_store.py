@@ -0,0 +1,161 @@
+import json
+import os
+import shutil
+import struct
+
+import numpy as np
+
+MAGIC = b'BIONSES1'
+ALIGNMENT = 64
+NUM_LANDMARKS = 33
+
+# File layout: MAGIC, u32 header length, JSON header, then one contiguous block per column,
+# each aligned to ALIGNMENT bytes so np.memmap can map it directly.
+
+
+def _column_specs(num_segments):
+    return {
+        'present': (np.uint8, ()),
+        'landmarks': (np.float32, (NUM_LANDMARKS, 3)),
+        'visibility': (np.float32, (NUM_LANDMARKS,)),
+        'flags': (np.uint8, ((num_segments + 7) // 8,)),
+    }
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class SessionRecorder:
+    def __init__(self, path, segment_names, fps=30.0, width=None, height=None):
+        self.path = str(path)
+        self.segment_names = list(segment_names)
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.frames = 0
+        self.columns = _column_specs(len(self.segment_names))
+        # Columns are streamed to side files and stitched together on close
+        self.parts = {name: open(self._part_path(name), 'wb') for name in self.columns}
+        self.empty_landmarks = np.zeros((NUM_LANDMARKS, 3), dtype=np.float32)
+        self.empty_visibility = np.zeros(NUM_LANDMARKS, dtype=np.float32)
+
+    def _part_path(self, name):
+        return f'{self.path}.{name}.part'
+
+    def write(self, landmarks, flags):
+        # landmarks: MediaPipe landmark list, a (33, 4) array, or None when no pose was found
+        if landmarks is None:
+            present = 0
+            coords, visibility = self.empty_landmarks, self.empty_visibility
+        else:
+            if not isinstance(landmarks, np.ndarray):
+                landmarks = [[lm.x, lm.y, lm.z, lm.visibility] for lm in landmarks]
+            landmarks = np.asarray(landmarks, dtype=np.float32)
+            present = 1
+            coords, visibility = landmarks[:, :3], landmarks[:, 3]
+
+        packed = np.packbits(np.asarray(flags, dtype=bool), bitorder='little')
+        self.parts['present'].write(bytes((present,)))
+        self.parts['landmarks'].write(np.ascontiguousarray(coords).tobytes())
+        self.parts['visibility'].write(np.ascontiguousarray(visibility).tobytes())
+        self.parts['flags'].write(packed.tobytes().ljust(self.columns['flags'][1][0], b'\0'))
+        self.frames += 1
+
+    def close(self):
+        if self.parts is None:
+            return
+        for part in self.parts.values():
+            part.close()
+
+        header = {
+            'version': 1,
+            'frames': self.frames,
+            'fps': self.fps,
+            'width': self.width,
+            'height': self.height,
+            'segments': self.segment_names,
+            'columns': {},
+        }
+        # The header size depends on the column offsets and vice versa, so grow until it fits
+        header_bytes = b''
+        while True:
+            data_start = _align(len(MAGIC) + 4 + len(header_bytes))
+            offset = data_start
+            for name, (dtype, shape) in self.columns.items():
+                header['columns'][name] = {
+                    'offset': offset,
+                    'dtype': np.dtype(dtype).str,
+                    'shape': list(shape),
+                }
+                offset = _align(offset + os.path.getsize(self._part_path(name)))
+            header_bytes = json.dumps(header).encode()
+            if len(MAGIC) + 4 + len(header_bytes) <= data_start:
+                break
+
+        with open(self.path, 'wb') as out:
+            out.write(MAGIC)
+            out.write(struct.pack('<I', len(header_bytes)))
+            out.write(header_bytes)
+            for name, column in header['columns'].items():
+                out.write(b'\0' * (column['offset'] - out.tell()))
+                with open(self._part_path(name), 'rb') as part:
+                    shutil.copyfileobj(part, out)
+                os.remove(self._part_path(name))
+        self.parts = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Session:
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{self.path} is not a BIONIC session file')
+            (header_length,) = struct.unpack('<I', f.read(4))
+            self.header = json.loads(f.read(header_length))
+
+        self.frames = self.header['frames']
+        self.fps = self.header['fps']
+        self.segments = self.header['segments']
+        self.columns = {}
+        for name, column in self.header['columns'].items():
+            shape = (self.frames, *column['shape'])
+            if self.frames == 0:
+                self.columns[name] = np.zeros(shape, dtype=column['dtype'])
+            else:
+                self.columns[name] = np.memmap(self.path, dtype=column['dtype'], mode='r',
+                                               offset=column['offset'], shape=shape)
+
+    def __len__(self):
+        return self.frames
+
+    @property
+    def present(self):
+        return self.columns['present'].view(bool)
+
+    @property
+    def landmarks(self):
+        return self.columns['landmarks']
+
+    @property
+    def visibility(self):
+        return self.columns['visibility']
+
+    def segment_flags(self, start=0, stop=None):
+        packed = self.columns['flags'][start:stop]
+        return np.unpackbits(packed, axis=1, count=len(self.segments), bitorder='little').astype(bool)
+
+    def landmark_array(self, start=0, stop=None):
+        # (frames, 33, 4) x, y, z, visibility with NaN where there was no pose, as kinematics expects
+        present = self.present[start:stop]
+        result = np.empty((len(present), NUM_LANDMARKS, 4), dtype=np.float32)
+        result[..., :3] = self.landmarks[start:stop]
+        result[..., 3] = self.visibility[start:stop]
+        result[~present] = np.nan
+        return result
@@ -0,0 +1,346 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from main import ProstheticJointDetector, parse_source
+from streams import open_source
+
+# Slot states, kept in the shared header next to each slot's sequence number
+FREE, WRITING, READY, READING = range(4)
+ALIGNMENT = 64
+
+
+class FrameRing:
+    # Fixed-size frame slots in shared memory. The capture process decodes a frame straight
+    # into a free slot and publishes (slot, sequence) on a queue; a worker claims the slot, reads
+    # the frame in place and releases it. Pixels never go through a pipe. When every slot is
+    # taken, the oldest unread frame is overwritten, so slow workers drop frames rather than
+    # fall behind. Pass the ring to worker processes as a Process argument.
+    def __init__(self, slots, shape, dtype=np.uint8, context=None):
+        context = context or multiprocessing.get_context('spawn')
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.header_bytes = (slots * 16 + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+        frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=self.header_bytes + slots * frame_bytes)
+        self.owner = True
+        self.lock = context.Lock()
+        self.ready = context.Queue()
+        self.dropped = 0
+        self._map()
+        self.header[:] = (-1, FREE)
+
+    def _map(self):
+        self.header = np.ndarray((self.slots, 2), dtype=np.int64, buffer=self.shm.buf)
+        self.frames = np.ndarray((self.slots, *self.shape), dtype=self.dtype, buffer=self.shm.buf,
+                                 offset=self.header_bytes)
+
+    def __getstate__(self):
+        return {
+            'name': self.shm.name,
+            'slots': self.slots,
+            'shape': self.shape,
+            'dtype': self.dtype.str,
+            'header_bytes': self.header_bytes,
+            'lock': self.lock,
+            'ready': self.ready,
+        }
+
+    def __setstate__(self, state):
+        self.slots = state['slots']
+        self.shape = state['shape']
+        self.dtype = np.dtype(state['dtype'])
+        self.header_bytes = state['header_bytes']
+        self.lock = state['lock']
+        self.ready = state['ready']
+        self.shm = shared_memory.SharedMemory(name=state['name'])
+        self.owner = False
+        self.dropped = 0
+        self._map()
+
+    def claim(self, overwrite=True):
+        # Producer: a slot to write the next frame into, or None when every slot is in use
+        with self.lock:
+            states = self.header[:, 1]
+            free = np.flatnonzero(states == FREE)
+            if len(free):
+                slot = int(free[0])
+            else:
+                ready = np.flatnonzero(states == READY) if overwrite else []
+                if not len(ready):
+                    return None
+                # Nobody has picked this frame up yet; its queue entry goes stale
+                slot = int(ready[np.argmin(self.header[ready, 0])])
+                self.dropped += 1
+            self.header[slot] = (-1, WRITING)
+        return slot
+
+    def publish(self, slot, sequence, captured_at):
+        with self.lock:
+            self.header[slot] = (sequence, READY)
+        self.ready.put((slot, sequence, captured_at))
+
+    def take(self, timeout=None):
+        # Worker: (slot, sequence, captured_at) of the next frame, or None at the end of the
+        # stream. Raises queue.Empty after timeout. The slot must be given back with release().
+        while True:
+            item = self.ready.get(timeout=timeout)
+            if item is None:
+                return None
+            slot, sequence, _ = item
+            with self.lock:
+                if self.header[slot, 0] != sequence or self.header[slot, 1] != READY:
+                    continue  # overwritten before we got to it
+                self.header[slot, 1] = READING
+            return item
+
+    def release(self, slot):
+        with self.lock:
+            self.header[slot] = (-1, FREE)
+
+    def finish(self, workers):
+        for _ in range(workers):
+            self.ready.put(None)
+
+    def close(self):
+        # The numpy views hold the buffer open, so drop them first
+        self.header = self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def frame_worker(worker_id, ring, detector_kwargs, results, cpu):
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cpu})
+
+    error = None
+    try:
+        detector = ProstheticJointDetector(**detector_kwargs)
+        while True:
+            item = ring.take()
+            if item is None:
+                break
+            slot, sequence, captured_at = item
+            started = time.monotonic()
+            try:
+                result = detector.detect(ring.frames[slot])
+            finally:
+                ring.release(slot)
+            # Only a few hundred bytes of metadata go back, never the frame
+            results.put({
+                'sequence': sequence,
+                'worker': worker_id,
+                'captured_at': captured_at,
+                'ms': 1000 * (time.monotonic() - started),
+                'landmarks': result.landmarks,
+                'detected': result.detected.tolist(),
+            })
+        detector.pose.close()
+    except Exception as e:
+        traceback.print_exc()
+        error = f'{type(e).__name__}: {e}'
+    finally:
+        ring.close()
+        results.put(('exit', worker_id, error))
+
+
+def skip_frame(cap):
+    if isinstance(cap, cv2.VideoCapture):
+        return cap.grab()
+    return cap.read()[0]
+
+
+def read_into(cap, out):
+    # OpenCV captures decode straight into the slot; other sources are copied in
+    if isinstance(cap, cv2.VideoCapture):
+        ret, frame = cap.read(out)
+    else:
+        ret, frame = cap.read()
+    if not ret:
+        return False
+    if frame is not out:
+        if frame.shape != out.shape:
+            return False
+        np.copyto(out, frame)
+    return True
+
+
+class SharedFramePipeline:
+    # Capture in this process, detection in worker processes that share a FrameRing. Each
+    # worker sees only some of the frames, so MediaPipe re-acquires the pose more often than
+    # in a single process; use it when one core cannot keep up with the source.
+    def __init__(self, source, workers=2, slots=None, detector_kwargs=None, pin_cpus=False, lossless=False):
+        self.source = source
+        self.lossless = lossless
+        self.workers = workers
+        self.slots = slots or 2 * workers
+        self.detector_kwargs = detector_kwargs or {}
+        self.pin_cpus = pin_cpus
+        # spawn rather than fork: MediaPipe graphs do not survive a fork
+        self.context = multiprocessing.get_context('spawn')
+        self.results = self.context.Queue()
+        self.processes = {}
+        self.errors = {}
+        self.ring = None
+        self.captured = 0
+        self.skipped = 0
+
+    def start(self, shape):
+        self.ring = FrameRing(self.slots, shape, context=self.context)
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+        for worker_id in range(self.workers):
+            cpu = cpus[(worker_id + 1) % len(cpus)] if self.pin_cpus and cpus else None
+            process = self.context.Process(
+                target=frame_worker,
+                args=(worker_id, self.ring, self.detector_kwargs, self.results, cpu),
+                daemon=True,
+            )
+            process.start()
+            self.processes[worker_id] = process
+
+    def capture(self, stop_after=None):
+        # Yields results while capturing; returns when the source ends and workers are done
+        cap = open_source(self.source)
+        ret, first = cap.read()
+        if not ret:
+            cap.release()
+            return
+        self.start(first.shape)
+        slot = self.ring.claim()
+        np.copyto(self.ring.frames[slot], first)
+        self.ring.publish(slot, 0, time.monotonic())
+        self.captured = 1
+
+        try:
+            while stop_after is None or self.captured < stop_after:
+                if not self.processes:
+                    break  # every worker has failed
+                slot = self.ring.claim(overwrite=not self.lossless)
+                if slot is None and self.lossless:
+                    # Files can wait for a worker to give a slot back
+                    yield from self._drain(timeout=0.005)
+                    continue
+                if slot is None:
+                    # Every slot is being read: skip this frame rather than wait for a worker
+                    if not skip_frame(cap):
+                        break
+                    self.skipped += 1
+                else:
+                    if not read_into(cap, self.ring.frames[slot]):
+                        self.ring.release(slot)
+                        break
+                    self.ring.publish(slot, self.captured, time.monotonic())
+                    self.captured += 1
+                yield from self._drain(timeout=0)
+        finally:
+            cap.release()
+            self.ring.finish(self.workers)
+        yield from self._drain(timeout=None)
+
+    def _drain(self, timeout):
+        # Results that arrive within timeout seconds; with None, until every worker has exited
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.processes:
+            wait = 0.5 if deadline is None else deadline - time.monotonic()
+            try:
+                result = self.results.get(timeout=wait) if wait > 0 else self.results.get_nowait()
+            except queue.Empty:
+                self._reap()
+                if deadline is None:
+                    continue
+                return
+            if isinstance(result, tuple):
+                _, worker_id, error = result
+                process = self.processes.pop(worker_id, None)
+                if process is not None:
+                    process.join(timeout=5)
+                if error is not None:
+                    self.errors[worker_id] = error
+                continue
+            yield result
+
+    def _reap(self):
+        # Workers that died without reporting back, e.g. killed or crashed in native code
+        for worker_id, process in list(self.processes.items()):
+            if process.exitcode is not None:
+                del self.processes[worker_id]
+                if process.exitcode != 0:
+                    self.errors.setdefault(worker_id, f'exited with code {process.exitcode}')
+
+    def stop(self):
+        for process in self.processes.values():
+            process.terminate()
+        self.processes = {}
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detection across worker processes fed through shared memory")
+    parser.add_argument("--source", default="0", help="camera index, video file, URL or loop:///file")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--slots", type=int, help="frame slots in the ring (default: 2 per worker)")
+    parser.add_argument("--frames", type=int, help="stop after capturing this many frames")
+    parser.add_argument("--pin-cpus", action="store_true",
+                        help="pin each worker to its own CPU, leaving the first for capture")
+    parser.add_argument("--lossless", action="store_true",
+                        help="wait for a free slot instead of dropping frames (for video files)")
+    parser.add_argument("--output", metavar="JSONL", help="write per-frame results here")
+    parser.add_argument("--report-every", type=float, default=2.0)
+    args = parser.parse_args()
+
+    pipeline = SharedFramePipeline(parse_source(args.source), workers=args.workers, slots=args.slots,
+                                   pin_cpus=args.pin_cpus, lossless=args.lossless)
+    output = open(args.output, 'w') if args.output else None
+    processed = 0
+    latencies = []
+    started = last_report = time.monotonic()
+    try:
+        for result in pipeline.capture(stop_after=args.frames):
+            processed += 1
+            latencies.append(1000 * (time.monotonic() - result['captured_at']))
+            if output is not None:
+                landmarks = result['landmarks']
+                output.write(json.dumps({
+                    'frame': result['sequence'],
+                    'worker': result['worker'],
+                    'landmarks': landmarks.tolist() if landmarks is not None else None,
+                    'prosthetic': result['detected'],
+                }) + '\n')
+            if time.monotonic() - last_report >= args.report_every:
+                elapsed = time.monotonic() - started
+                print(f"{processed} frames processed, {processed / elapsed:.1f} fps, "
+                      f"latency {np.median(latencies[-100:]):.0f} ms", flush=True)
+                last_report = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring_dropped = pipeline.ring.dropped if pipeline.ring is not None else 0
+        pipeline.stop()
+        if output is not None:
+            output.close()
+
+    elapsed = time.monotonic() - started
+    print(f"captured {pipeline.captured}, processed {processed} in {elapsed:.1f}s "
+          f"({processed / elapsed if elapsed else 0:.1f} fps); dropped {ring_dropped} unread frames, "
+          f"skipped {pipeline.skipped} with every slot busy")
+    for worker_id, error in sorted(pipeline.errors.items()):
+        print(f"worker {worker_id} failed: {error}")
+    if latencies:
+        print(f"capture-to-result latency: median {np.median(latencies):.0f} ms, "
+              f"p95 {np.percentile(latencies, 95):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import math
+from collections import deque, namedtuple
+
+import numpy as np
+
+# Stand-in for MediaPipe's landmark message, with the same attribute names
+Landmark = namedtuple('Landmark', ['x', 'y', 'z', 'visibility'])
+
+
+def landmarks_to_array(landmarks, out=None):
+    # With out, fills that (n, 4) array in place instead of allocating a new one
+    values = [value for lm in landmarks for value in (lm.x, lm.y, lm.z, lm.visibility)]
+    if out is None:
+        return np.array(values, dtype=np.float64).reshape(-1, 4)
+    out.reshape(-1)[:] = values
+    return out
+
+
+class OneEuroFilter:
+    # One Euro filter (Casiez et al.) applied elementwise to an array of any shape
+    def __init__(self, min_cutoff=1.0, beta=0.0, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.x_prev = None
+        self.dx_prev = None
+        self.t_prev = None
+
+    @staticmethod
+    def alpha(dt, cutoff):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, x, t):
+        x = np.asarray(x, dtype=np.float64)
+        if self.x_prev is None or t <= self.t_prev:
+            self.x_prev, self.dx_prev, self.t_prev = x, np.zeros_like(x), t
+            return x
+
+        dt = t - self.t_prev
+        a_d = self.alpha(dt, self.d_cutoff)
+        dx_hat = a_d * (x - self.x_prev) / dt + (1 - a_d) * self.dx_prev
+
+        cutoff = self.min_cutoff + self.beta * np.abs(dx_hat)
+        a = self.alpha(dt, cutoff)
+        x_hat = a * x + (1 - a) * self.x_prev
+
+        self.x_prev, self.dx_prev, self.t_prev = x_hat, dx_hat, t
+        return x_hat
+
+
+class LandmarkSmoother:
+    # Smooths inferred landmarks and fills in frames where inference was skipped
+    def __init__(self, fps=30.0, min_cutoff=1.0, beta=0.5):
+        self.fps = fps
+        self.filter = OneEuroFilter(min_cutoff=min_cutoff, beta=beta)
+        self.keyframes = deque(maxlen=2)
+
+    def reset(self):
+        self.filter.reset()
+        self.keyframes.clear()
+
+    def _smooth(self, index, landmarks):
+        smoothed = landmarks.copy()
+        # Visibility is a confidence, not a position, so it is passed through as-is
+        smoothed[:, :3] = self.filter(landmarks[:, :3], index / self.fps)
+        return smoothed
+
+    def update(self, index, landmarks):
+        self.keyframes.append((index, landmarks))
+        return self._smooth(index, landmarks)
+
+    def predict(self, index):
+        if not self.keyframes:
+            return None
+        last_index, last = self.keyframes[-1]
+        predicted = last.copy()
+        if len(self.keyframes) == 2:
+            # Constant-velocity extrapolation from the last two inferred frames
+            first_index, first = self.keyframes[0]
+            velocity = (last[:, :3] - first[:, :3]) / (last_index - first_index)
+            predicted[:, :3] += velocity * (index - last_index)
+        return self._smooth(index, predicted)
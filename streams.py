@@ -0,0 +1,220 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import time
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+
+from main import ProstheticJointDetector, parse_source
+
+
+class LoopingVideoSource:
+    # Local stand-in for a network camera: replays a file at its own frame rate, forever.
+    # Addressed as loop:///path/to/video.mp4 (optionally ?fps=15).
+    def __init__(self, url):
+        parsed = urlparse(url)
+        self.path = parsed.netloc + parsed.path
+        self.cap = cv2.VideoCapture(self.path)
+        fps = parse_qs(parsed.query).get('fps')
+        self.fps = float(fps[0]) if fps else (self.cap.get(cv2.CAP_PROP_FPS) or 30.0)
+        self.next_frame_at = time.perf_counter()
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        delay = self.next_frame_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_frame_at = max(self.next_frame_at, time.perf_counter() - 1.0 / self.fps) + 1.0 / self.fps
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+def open_source(source):
+    # Device indices, files and rtsp://, http:// URLs go straight to OpenCV
+    if isinstance(source, str) and source.startswith('loop://'):
+        return LoopingVideoSource(source)
+    cap = cv2.VideoCapture(source)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+def stream_worker(worker_id, streams, detector_kwargs, stats_queue, stop_event, report_every, cpu):
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cpu})
+
+    # One detector per stream, so MediaPipe tracking state never leaks between cameras
+    active = {}
+    for stream_id, source in streams:
+        active[stream_id] = {
+            'source': source,
+            'cap': open_source(source),
+            'detector': ProstheticJointDetector(**detector_kwargs),
+            'frames': 0,
+            'window_frames': 0,
+            'busy': 0.0,
+        }
+
+    window_start = time.perf_counter()
+    while active and not stop_event.is_set():
+        for stream_id, stream in list(active.items()):
+            ret, frame = stream['cap'].read()
+            if not ret:
+                stream['cap'].release()
+                del active[stream_id]
+                stats_queue.put(_stream_stats(worker_id, stream_id, stream, 0.0, done=True))
+                continue
+            started = time.perf_counter()
+            stream['detector'].detect(frame)
+            stream['busy'] += time.perf_counter() - started
+            stream['frames'] += 1
+            stream['window_frames'] += 1
+
+        elapsed = time.perf_counter() - window_start
+        if elapsed >= report_every:
+            for stream_id, stream in active.items():
+                stats_queue.put(_stream_stats(worker_id, stream_id, stream, elapsed))
+                stream['window_frames'] = 0
+                stream['busy'] = 0.0
+            window_start = time.perf_counter()
+
+    for stream_id, stream in active.items():
+        stream['cap'].release()
+        stats_queue.put(_stream_stats(worker_id, stream_id, stream, 0.0, done=True))
+
+
+def _stream_stats(worker_id, stream_id, stream, elapsed, done=False):
+    return {
+        'worker': worker_id,
+        'stream': stream_id,
+        'source': str(stream['source']),
+        'frames': stream['frames'],
+        'fps': stream['window_frames'] / elapsed if elapsed > 0 else 0.0,
+        'ms_per_frame': 1000 * stream['busy'] / stream['window_frames'] if stream['window_frames'] else 0.0,
+        'done': done,
+    }
+
+
+class StreamManager:
+    def __init__(self, sources, workers=None, detector_kwargs=None, report_every=2.0, pin_cpus=False):
+        self.sources = list(sources)
+        self.workers = min(workers or os.cpu_count(), len(self.sources))
+        self.detector_kwargs = detector_kwargs or {}
+        self.report_every = report_every
+        self.pin_cpus = pin_cpus
+        # spawn rather than fork: MediaPipe graphs do not survive a fork
+        self.context = multiprocessing.get_context('spawn')
+        self.stats_queue = self.context.Queue()
+        self.stop_event = self.context.Event()
+        self.processes = []
+        self.assignments = []
+        self.stats = {}
+
+    def start(self):
+        self.assignments = [[] for _ in range(self.workers)]
+        for stream_id, source in enumerate(self.sources):
+            self.assignments[stream_id % self.workers].append((stream_id, source))
+
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+        for worker_id, streams in enumerate(self.assignments):
+            cpu = cpus[worker_id % len(cpus)] if self.pin_cpus and cpus else None
+            process = self.context.Process(
+                target=stream_worker,
+                args=(worker_id, streams, self.detector_kwargs, self.stats_queue,
+                      self.stop_event, self.report_every, cpu),
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+
+    def stop(self):
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    def poll(self, timeout=0.5):
+        # Workers that have exited before draining have already queued everything they will send
+        exited = [(worker_id, process.exitcode) for worker_id, process in enumerate(self.processes)
+                  if process.exitcode is not None]
+        try:
+            while True:
+                stats = self.stats_queue.get(timeout=timeout)
+                self.stats[stats['stream']] = stats
+                timeout = 0
+        except queue.Empty:
+            pass
+
+        # A worker that died (e.g. the detector failed to load) never reports its streams done
+        for worker_id, exitcode in exited:
+            for stream_id, source in self.assignments[worker_id]:
+                if stream_id not in self.stats or not self.stats[stream_id]['done']:
+                    frames = self.stats[stream_id]['frames'] if stream_id in self.stats else 0
+                    self.stats[stream_id] = {
+                        'worker': worker_id,
+                        'stream': stream_id,
+                        'source': str(source),
+                        'frames': frames,
+                        'fps': 0.0,
+                        'ms_per_frame': 0.0,
+                        'done': True,
+                        'error': f'worker exited with code {exitcode}',
+                    }
+        return self.stats
+
+    @property
+    def finished(self):
+        return (len(self.stats) == len(self.sources)
+                and all(stats['done'] for stats in self.stats.values()))
+
+    def report(self):
+        lines = []
+        for stream_id in sorted(self.stats):
+            stats = self.stats[stream_id]
+            if stats.get('error'):
+                state = f"failed: {stats['error']}"
+            else:
+                state = 'done' if stats['done'] else f"{stats['fps']:5.1f} fps, {stats['ms_per_frame']:5.1f} ms/frame"
+            lines.append(f"[{stream_id}] worker {stats['worker']} {stats['source']}: "
+                         f"{stats['frames']} frames, {state}")
+        total = sum(stats['fps'] for stats in self.stats.values() if not stats['done'])
+        lines.append(f'total {total:.1f} fps across {len(self.sources)} streams')
+        return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run prosthetic segment detection on several cameras")
+    parser.add_argument("sources", nargs="+",
+                        help="camera indices, video files, rtsp:// URLs or loop:///file stand-ins")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per stream, up to CPU count)")
+    parser.add_argument("--pin-cpus", action="store_true", help="pin each worker process to its own CPU")
+    parser.add_argument("--report-every", type=float, default=2.0, help="seconds between throughput reports")
+    args = parser.parse_args()
+
+    manager = StreamManager([parse_source(source) for source in args.sources],
+                            workers=args.workers, report_every=args.report_every, pin_cpus=args.pin_cpus)
+    manager.start()
+    try:
+        next_report = time.perf_counter() + args.report_every
+        while not manager.finished:
+            manager.poll()
+            if time.perf_counter() >= next_report:
+                print(manager.report(), flush=True)
+                next_report += args.report_every
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.stop()
+        manager.poll(timeout=0.1)
+        print(manager.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import json
+
+import cv2
+import numpy as np
+
+from batch import analyze_frame
+from kinematics import JOINT_NAMES, analyze_session, landmarks_from_records
+from main import ProstheticJointDetector
+
+SUMMARY_VERSION = 1
+KEYFRAME_JOINTS = ['left_knee', 'right_knee', 'left_hip', 'right_hip']
+
+
+def frame_time(cap, index, fallback_fps):
+    # Browser recordings have no reliable frame rate, so frames are placed by their timestamps;
+    # streams without timestamps fall back to the container's rate
+    msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+    if msec > 0 or index == 0:
+        return msec / 1000.0
+    return index / fallback_fps
+
+
+def sampling_rates(frames, last_t, samples, fallback_fps):
+    # (sampled fps, source fps) for a pass that saw frames frames, the last one starting at
+    # last_t seconds, one frame interval short of the end
+    source_fps = (frames - 1) / last_t if last_t > 0 else fallback_fps
+    duration = frames / source_fps
+    return (samples / duration if duration else fallback_fps), source_fps
+
+
+def extract_records(path, target_fps=10.0, detector=None):
+    # Run the detector on frames target_fps apart in time so long recordings stay quick to summarise
+    detector = detector or ProstheticJointDetector()
+    cap = cv2.VideoCapture(str(path))
+    fallback_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    records = []
+    index = 0
+    next_sample = 0.0
+    last_t = 0.0
+    while cap.grab():
+        t = frame_time(cap, index, fallback_fps)
+        last_t = max(last_t, t)
+        if t >= next_sample:
+            while next_sample <= t:
+                next_sample += 1.0 / target_fps
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            landmarks, overlap_areas, prosthetic = analyze_frame(detector, frame)
+            records.append({'frame': index, 'landmarks': landmarks, 'prosthetic': prosthetic})
+        index += 1
+    cap.release()
+
+    fps, source_fps = sampling_rates(index, last_t, len(records), fallback_fps)
+    return records, {
+        'fps': fps,
+        'source_fps': source_fps,
+        'width': width,
+        'height': height,
+        'frames': index,
+        'segments': detector.segment_names,
+    }
+
+
+def _round(value, digits=1):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def summarize(records, info, curve_hz=2.0, max_keyframes=6):
+    fps = info['fps']
+    landmarks = landmarks_from_records(records)
+    aspect = info['width'] / info['height'] if info['height'] else 1.0
+    session = analyze_session(landmarks, fps=fps, aspect=aspect)
+    angles, velocity = session['angles'], session['angular_velocity']
+    times = np.array([record['frame'] for record in records]) / info['source_fps']
+
+    joints = {}
+    for j, name in enumerate(JOINT_NAMES):
+        rom = session['range_of_motion'][name]
+        column = angles[:, j]
+        valid = ~np.isnan(column)
+        speed = np.abs(velocity[:, j])
+        joints[name] = {
+            'min': _round(rom['min']),
+            'max': _round(rom['max']),
+            'range': _round(rom['range']),
+            'mean': _round(column[valid].mean()) if valid.any() else None,
+            'peak_velocity_deg_s': _round(np.nanmax(speed)) if not np.isnan(speed).all() else None,
+        }
+
+    # Angle curves resampled to a couple of points per second, as whole degrees
+    step = max(1, round(fps / curve_hz))
+    curves = {'hz': fps / step}
+    for j, name in enumerate(JOINT_NAMES):
+        curves[name] = [None if np.isnan(value) else int(round(value)) for value in angles[::step, j]]
+
+    posed = np.array([record['landmarks'] is not None for record in records], dtype=bool)
+    flags = np.array([record['prosthetic'] for record in records if record['landmarks'] is not None],
+                     dtype=bool).reshape(-1, len(info['segments']))
+    segment_rates = flags.mean(axis=0) if len(flags) else np.zeros(len(info['segments']))
+
+    # Keyframes at the extremes of the knee and hip angles
+    keyframes = {}
+    for name in KEYFRAME_JOINTS:
+        column = angles[:, JOINT_NAMES.index(name)]
+        if np.isnan(column).all():
+            continue
+        for reason, i in ((f'min {name}', np.nanargmin(column)), (f'max {name}', np.nanargmax(column))):
+            keyframes.setdefault(int(i), []).append(reason)
+    keyframes = [
+        {
+            't': _round(times[i], 2),
+            'reasons': reasons,
+            'angles': {name: _round(angles[i, j]) for j, name in enumerate(JOINT_NAMES)},
+        }
+        for i, reasons in sorted(keyframes.items())[:max_keyframes]
+    ]
+
+    return {
+        'version': SUMMARY_VERSION,
+        'video': {
+            'duration_s': _round(info['frames'] / info['source_fps'], 2),
+            'frames_analysed': len(records),
+            'analysed_fps': _round(fps),
+            'pose_detected_fraction': _round(posed.mean() if len(posed) else 0.0, 3),
+        },
+        'joints': joints,
+        'angle_curves_deg': curves,
+        'prosthetic_segments': {
+            name: _round(rate, 3) for name, rate in zip(info['segments'], segment_rates)
+        },
+        'keyframes': keyframes,
+    }
+
+
+def summarize_video(path, target_fps=10.0):
+    records, info = extract_records(path, target_fps)
+    return summarize(records, info)
+
+
+def summary_text(summary):
+    return json.dumps(summary, separators=(',', ':'))
+
+
+if __name__ == "__main__":
+    import sys
+    print(json.dumps(summarize_video(sys.argv[1]), indent=2))